@@ -0,0 +1,339 @@
+import os
+import struct
+import sys
+import time
+
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .filecache import is_racy
+from .labelme import ImageData, read_labelme
+from .records import Annotation, Shape
+from .util import is_number, write_atomic_bytes
+
+# version of the binary layout (see _Columns.to_bytes)
+ANNOTATION_CACHE_VERSION = 2
+MAGIC = b"DTANNO"
+
+# bits of the "present" column (optional keys of a labelme file)
+HAS_VERSION = 1
+HAS_FLAGS = 2
+HAS_IMAGE_DATA = 4
+IMAGE_DATA_NULL = 8
+
+# column name: array typecode ("s" = list of strings)
+COLUMNS: Dict[str, str] = {
+    "path": "s",
+    "size": "q",
+    "mtime": "q",
+    "present": "b",
+    "version": "s",
+    "image_path": "s",
+    "height": "q",
+    "width": "q",
+    "image_data_start": "q",
+    "image_data_end": "q",
+    "image_flag_start": "q",  # images + 1 offsets into image_flags
+    "image_flags": "i",  # name ids of flags that are true
+    "shape_start": "q",  # images + 1 offsets into shape columns
+    "label": "i",  # name id
+    "shape_type": "i",  # name id, -1 = null
+    "point_start": "q",  # shapes + 1 offsets into points
+    "points": "d",  # x, y, x, y, ...
+    "flag_start": "q",  # shapes + 1 offsets into flags
+    "flags": "i",  # name ids of flags that are true
+    "names": "s",  # labels, shape types and flag names
+}
+
+# item size of every array column, stored in the header (a cache of a different platform is not read)
+ITEM_SIZES = bytes(array(typecode).itemsize for typecode in COLUMNS.values() if typecode != "s")
+
+
+def _encode_strings(strings: List[str]) -> bytes:
+    return "\0".join(strings).encode()
+
+
+def _decode_strings(data: bytes, count: int) -> List[str]:
+    return data.decode().split("\0") if count > 0 else []
+
+
+def read_annotation(path: str) -> Optional[Dict[str, Any]]:
+    """
+    read_labelme that returns None instead of raising (used in worker processes).
+    """
+    try:
+        return read_labelme(path)
+    except (OSError, ValueError):
+        return None
+
+
+class _Columns:
+    """
+    Column arrays of the cache, one row per annotation file (images) and per shape.
+    """
+
+    def __init__(self, names: Optional[List[str]] = None) -> None:
+        self.data: Dict[str, Any] = {
+            name: [] if typecode == "s" else array(typecode) for name, typecode in COLUMNS.items()}
+        for offsets in ("image_flag_start", "shape_start", "point_start", "flag_start"):
+            self.data[offsets].append(0)
+        # name ids stay the same when names of other columns are reused (see copy_row)
+        self.data["names"] = list(names or [])
+        self.name_ids: Dict[str, int] = {name: index for index, name in enumerate(self.data["names"])}
+
+    def __len__(self) -> int:
+        return len(self.data["path"])
+
+    def _name_id(self, name: str) -> int:
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.data["names"])
+            self.data["names"].append(name)
+        return name_id
+
+    def _true_flags(self, flags: Any) -> List[int]:
+        if not isinstance(flags, dict):
+            raise TypeError("flags")
+        return [self._name_id(flag) for flag, value in flags.items() if value is True]
+
+    def append(self, path: str, size: int, mtime: int, file: Dict[str, Any]) -> bool:
+        """
+        Adds a parsed labelme file, returns False (and adds nothing) if it can't be stored.
+        """
+        try:
+            return self._append(path, size, mtime, file)
+        except (KeyError, TypeError, ValueError):
+            return False
+
+    def _append(self, path: str, size: int, mtime: int, file: Dict[str, Any]) -> bool:
+        if not isinstance(file.get("imagePath"), str) or not isinstance(file.get("shapes"), list) \
+                or not isinstance(file.get("imageHeight"), int) or not isinstance(file.get("imageWidth"), int):
+            return False
+        present = 0
+        if isinstance(file.get("version"), str):
+            present |= HAS_VERSION
+        elif "version" in file:
+            return False
+        image_flags = self._true_flags(file["flags"]) if "flags" in file else []
+        if "flags" in file:
+            present |= HAS_FLAGS
+        image_data = file.get("imageData")
+        if "imageData" in file:
+            present |= HAS_IMAGE_DATA
+            if image_data is None:
+                present |= IMAGE_DATA_NULL
+            elif not isinstance(image_data, ImageData):
+                return False
+        # validate all shapes before anything is appended
+        shapes: List[Tuple[int, int, List[float], List[int]]] = []
+        for shape in file["shapes"]:
+            label = shape["label"]
+            shape_type = shape.get("shape_type")
+            points = [coordinate for point in shape["points"] for coordinate in point]
+            if not isinstance(label, str) or not (shape_type is None or isinstance(shape_type, str)) \
+                    or any(len(point) != 2 for point in shape["points"]) \
+                    or not all(is_number(coordinate) for coordinate in points):
+                return False
+            shapes.append((self._name_id(label), -1 if shape_type is None else self._name_id(shape_type),
+                           points, self._true_flags(shape.get("flags", {}))))
+        data = self.data
+        data["path"].append(path)
+        data["size"].append(size)
+        data["mtime"].append(mtime)
+        data["present"].append(present)
+        data["version"].append(file.get("version") or "")
+        data["image_path"].append(file["imagePath"])
+        data["height"].append(file["imageHeight"])
+        data["width"].append(file["imageWidth"])
+        data["image_data_start"].append(image_data.start if isinstance(image_data, ImageData) else 0)
+        data["image_data_end"].append(image_data.end if isinstance(image_data, ImageData) else 0)
+        data["image_flags"].extend(image_flags)
+        data["image_flag_start"].append(len(data["image_flags"]))
+        for label, shape_type, points, flags in shapes:
+            data["label"].append(label)
+            data["shape_type"].append(shape_type)
+            data["points"].extend(points)
+            data["point_start"].append(len(data["points"]))
+            data["flags"].extend(flags)
+            data["flag_start"].append(len(data["flags"]))
+        data["shape_start"].append(len(data["label"]))
+        return True
+
+    def copy_row(self, other: "_Columns", index: int) -> None:
+        """
+        Copies a file from other columns, which must have the same names (or a prefix of them).
+        """
+        data = self.data
+        source = other.data
+        for name in ("path", "size", "mtime", "present", "version", "image_path", "height", "width",
+                     "image_data_start", "image_data_end"):
+            data[name].append(source[name][index])
+        data["image_flags"].extend(
+            source["image_flags"][source["image_flag_start"][index]:source["image_flag_start"][index + 1]])
+        data["image_flag_start"].append(len(data["image_flags"]))
+        first, last = source["shape_start"][index], source["shape_start"][index + 1]
+        data["label"].extend(source["label"][first:last])
+        data["shape_type"].extend(source["shape_type"][first:last])
+        for shape in range(first, last):
+            data["points"].extend(source["points"][source["point_start"][shape]:source["point_start"][shape + 1]])
+            data["point_start"].append(len(data["points"]))
+            data["flags"].extend(source["flags"][source["flag_start"][shape]:source["flag_start"][shape + 1]])
+            data["flag_start"].append(len(data["flags"]))
+        data["shape_start"].append(len(data["label"]))
+
+    def record(self, index: int) -> Annotation:
+        """
+        Returns the labelme file at index, like read_labelme would (only true flags are kept).
+        """
+        data = self.data
+        names = data["names"]
+        path = data["path"][index]
+        present = data["present"][index]
+        shapes: List[Shape] = []
+        for shape in range(data["shape_start"][index], data["shape_start"][index + 1]):
+            coordinates = data["points"][data["point_start"][shape]:data["point_start"][shape + 1]]
+            shape_type = data["shape_type"][shape]
+            shapes.append(Shape(
+                names[data["label"][shape]],
+                [[coordinates[i], coordinates[i + 1]] for i in range(0, len(coordinates), 2)],
+                None if shape_type < 0 else names[shape_type],
+                {names[flag]: True for flag in data["flags"][data["flag_start"][shape]:data["flag_start"][shape + 1]]},
+            ))
+        annotation = Annotation(shapes, data["image_path"][index], data["height"][index], data["width"][index])
+        if present & HAS_VERSION:
+            annotation.version = data["version"][index]
+        if present & HAS_FLAGS:
+            annotation.flags = {names[flag]: True for flag in
+                                data["image_flags"][data["image_flag_start"][index]:data["image_flag_start"][index + 1]]}
+        if present & HAS_IMAGE_DATA:
+            annotation.image_data = None if present & IMAGE_DATA_NULL else \
+                ImageData(path, data["image_data_start"][index], data["image_data_end"][index])
+        return annotation
+
+    def to_bytes(self) -> bytes:
+        parts = [MAGIC, struct.pack("<IB", ANNOTATION_CACHE_VERSION, sys.byteorder == "little"), ITEM_SIZES]
+        for name, typecode in COLUMNS.items():
+            column = self.data[name]
+            raw = _encode_strings(column) if typecode == "s" else column.tobytes()
+            parts.append(struct.pack("<QQ", len(column), len(raw)))
+            parts.append(raw)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "_Columns":
+        header_size = len(MAGIC) + 5 + len(ITEM_SIZES)
+        version, little = struct.unpack_from("<IB", raw, len(MAGIC))
+        if raw[:len(MAGIC)] != MAGIC or version != ANNOTATION_CACHE_VERSION \
+                or bool(little) != (sys.byteorder == "little") \
+                or raw[header_size - len(ITEM_SIZES):header_size] != ITEM_SIZES:
+            raise ValueError("Incompatible annotation cache")
+        columns = cls()
+        pos = header_size
+        for name, typecode in COLUMNS.items():
+            count, length = struct.unpack_from("<QQ", raw, pos)
+            pos += 16
+            if typecode == "s":
+                columns.data[name] = _decode_strings(raw[pos:pos + length], count)
+            else:
+                column = array(typecode)
+                column.frombytes(raw[pos:pos + length])
+                columns.data[name] = column
+            pos += length
+        columns.name_ids = {name: index for index, name in enumerate(columns.data["names"])}
+        return columns
+
+
+class AnnotationCache:
+    """
+    Binary, column based cache of parsed labelme files (images, shapes, labels, flags and points).
+    Files are parsed again only if their size or mtime changed, \
+        so all converters can share one parse of the dataset.
+    Files that were not refreshed during a run are dropped on save.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.columns = self._load()
+        self.index: Dict[str, int] = {path: index for index, path in enumerate(self.columns.data["path"])}
+        # files parsed during this run, stored in the same layout (names of old columns are kept)
+        self.fresh = _Columns(self.columns.data["names"])
+        self.fresh_index: Dict[str, int] = {}
+        # files parsed during this run that can't be stored (None = not a json object, or changed too recently)
+        self.unstored: Dict[str, Optional[Dict[str, Any]]] = {}
+        # files refreshed during this run (others are dropped on save)
+        self.seen: Set[str] = set()
+
+    def _load(self) -> _Columns:
+        try:
+            with open(self.path, "rb") as file:
+                return _Columns.from_bytes(file.read())
+        except (OSError, ValueError, struct.error):
+            return _Columns()
+
+    def _is_fresh(self, key: str, stats: Tuple[int, int]) -> bool:
+        index = self.index.get(key)
+        return index is not None and \
+            (self.columns.data["size"][index], self.columns.data["mtime"][index]) == stats
+
+    def refresh(self, paths: Iterable[str],
+                map_function: Callable[..., Iterable[Optional[Dict[str, Any]]]] = map) -> None:
+        """
+        Parses files that are not in the cache or changed (map_function can parse them in parallel).
+        """
+        changed: List[str] = []
+        changed_stats: List[Tuple[int, int]] = []
+        for path in paths:
+            key = os.path.abspath(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            self.seen.add(key)
+            stats = (stat.st_size, stat.st_mtime_ns)
+            if not self._is_fresh(key, stats):
+                changed.append(key)
+                changed_stats.append(stats)
+        # changes after this time change the mtime, unless they are in the same tick
+        read_time = time.time_ns()
+        for key, stats, file in zip(changed, changed_stats, map_function(read_annotation, changed)):
+            # a racy file is used in this run, but parsed again in the next one
+            if file is not None and not is_racy(stats[1], read_time) \
+                    and self.fresh.append(key, stats[0], stats[1], file):
+                self.fresh_index[key] = len(self.fresh) - 1
+            else:
+                self.unstored[key] = file
+
+    def get(self, path: str) -> Optional[Annotation]:
+        """
+        Returns the parsed labelme file, or None if it is not cached (read it with read_labelme).
+        """
+        key = os.path.abspath(path)
+        if key in self.fresh_index:
+            return self.fresh.record(self.fresh_index[key])
+        if key in self.unstored:
+            file = self.unstored[key]
+            try:
+                return None if file is None else Annotation.from_dict(file)
+            except (KeyError, TypeError):
+                return None
+        index = self.index.get(key)
+        return None if index is None else self.columns.record(index)
+
+    def save(self) -> None:
+        if not self.fresh_index and not any(key in self.index for key in self.unstored) \
+                and all(key in self.seen for key in self.index):
+            return
+        # fresh names start with the old names, so name ids of both are valid
+        columns = _Columns(self.fresh.data["names"])
+        for key, index in self.index.items():
+            if key in self.seen and key not in self.fresh_index and key not in self.unstored:
+                columns.copy_row(self.columns, index)
+        for index in range(len(self.fresh)):
+            columns.copy_row(self.fresh, index)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        write_atomic_bytes(self.path, columns.to_bytes())
+        self.columns = columns
+        self.index = {path: index for index, path in enumerate(columns.data["path"])}
+        self.fresh = _Columns(columns.data["names"])
+        self.fresh_index = {}
+        self.unstored = {}
@@ -0,0 +1,98 @@
+from array import array
+from typing import Dict, List, Sequence
+
+from .records import Annotation
+
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
+
+Row = List[float]
+
+
+class BboxBatch:
+    """
+    Collects bboxes of many shapes (even from many files) to normalize them at once.
+    Uses numpy when it is installed, the results are the same as computing every bbox with floats.
+    """
+
+    def __init__(self) -> None:
+        # x y x y of every bbox
+        self.coords = array("d")
+        # width height of the image of every bbox
+        self.sizes = array("d")
+
+    def __len__(self) -> int:
+        return len(self.sizes) // 2
+
+    def append(self, points: Sequence[Sequence[float]], height: int, width: int) -> None:
+        """
+        Adds the bbox of the first two points, raises ValueError (before adding anything) if they aren't x y numbers.
+        """
+        if not height or not width:
+            raise ValueError("Image size is zero")
+        try:
+            if len(points) < 2 or not all(len(point) == 2 for point in points[:2]):
+                raise ValueError("Bbox needs two points of two coordinates")
+            coords = array("d", [*points[0], *points[1]])
+        except TypeError:
+            raise ValueError("Bbox points are not numbers") from None
+        self.coords.extend(coords)
+        self.sizes.append(width)
+        self.sizes.append(height)
+
+    def truncate(self, length: int) -> None:
+        """
+        Removes bboxes after the first length bboxes.
+        """
+        del self.coords[length * 4:]
+        del self.sizes[length * 2:]
+
+    def normalize(self) -> List[Row]:
+        """
+        Returns [center x, center y, length x, length y] relative to the image size for every bbox.
+        """
+        if _np is None:
+            return self._normalize_array()
+        coords = _np.frombuffer(self.coords, dtype=_np.float64).reshape(-1, 4)
+        sizes = _np.frombuffer(self.sizes, dtype=_np.float64).reshape(-1, 2)
+        normalized = _np.empty((len(sizes), 4))
+        # same operations (and order) as the scalar version
+        normalized[:, 0] = (coords[:, 0] + coords[:, 2]) / 2 / sizes[:, 0]
+        normalized[:, 1] = (coords[:, 1] + coords[:, 3]) / 2 / sizes[:, 1]
+        normalized[:, 2] = _np.abs(coords[:, 0] - coords[:, 2]) / sizes[:, 0]
+        normalized[:, 3] = _np.abs(coords[:, 1] - coords[:, 3]) / sizes[:, 1]
+        return normalized.tolist()
+
+    def _normalize_array(self) -> List[Row]:
+        x0, y0, x1, y1 = (self.coords[i::4] for i in range(4))
+        widths, heights = self.sizes[0::2], self.sizes[1::2]
+        return [[(x0 + x1) / 2 / width, (y0 + y1) / 2 / height, abs(x0 - x1) / width, abs(y0 - y1) / height]
+                for x0, y0, x1, y1, width, height in zip(x0, y0, x1, y1, widths, heights)]
+
+
+def format_labels(class_ids: Sequence[int], rows: Sequence[Row]) -> List[str]:
+    """
+    Formats yolo label lines ("class x y width height").
+    """
+    return [f"{class_id} " + " ".join(map(str, row)) for class_id, row in zip(class_ids, rows)]
+
+
+def collect_labels(old: Annotation, classes: Dict[str, int], batch: BboxBatch) -> List[int]:
+    """
+    Adds bboxes of all vehicles to batch, returns their class ids (one label line each).
+    Raises ValueError if a vehicle has no known type or bad points, or the image size is zero, \
+        nothing is added then.
+    """
+    start = len(batch)
+    class_ids: List[int] = []
+    try:
+        for shape in old.shapes:
+            if shape.label == "vehicle":
+                class_ids.append(classes[shape.selected_flag(classes)])
+                batch.append(shape.points, old.image_height, old.image_width)
+    except ValueError:
+        batch.truncate(start)
+        raise
+    return class_ids
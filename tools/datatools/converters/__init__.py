@@ -1,12 +1,16 @@
 from typing import Dict, Type
 
 from .attributes import AttributesConverter
-from .base_converter import Converter
+from .base_converter import Converter, check_formats, convert_many
+from .coco import CocoConverter
+from .voc import VocConverter
 from .yolo import YoloConverter
 from .yolo_tiny import YoloTinyConverter
 
 name_converter_map: Dict[str, Type[Converter]] = {
     "attributes": AttributesConverter,
+    "coco": CocoConverter,
+    "voc": VocConverter,
     "yolo": YoloConverter,
     "yolo-tiny": YoloTinyConverter
 }
@@ -1,17 +1,18 @@
 import argparse
 import os
 
-from json import dumps, load
 from pathlib import Path
 from random import shuffle
-from time import time
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from .. import defaults
-from ..finder import Finder
+from ..jsonio import dumps
 from ..logger import get_logger
+from ..records import Annotation, Shape
+from ..spatial import RectIndex
 from ..util import round_to_digits
-from .base_converter import Converter, ConverterArgs
+from ..writers import JsonArrayWriter, open_json_writer
+from .base_converter import Converter, ConverterArgs, create_finder
 
 logger = get_logger()
 
@@ -26,44 +27,61 @@ Vehicle = Tuple[str, Bbox]
 
 class AttributesArgs(ConverterArgs):
     no_multiple: bool
-
-
-def _is_point_in_rect(point: Point, rect: Bbox) -> bool:
-    # point: [x, y]
-    # rect: [xmin, ymin, xmax, ymax]
-    return point[0] > rect[0] and \
-        point[0] < rect[2] and \
-        point[1] > rect[1] and \
-        point[1] < rect[3]
+    stream: bool
+    jsonl: bool
 
 
 class AttributesConverter(Converter):
     def __init__(self, args: AttributesArgs):
-        super().__init__(Finder(args.input, args.prefix, args.data_extension), args)
+        super().__init__(create_finder(args), args)
         self.allow_multiple = args.no_multiple
+        # write vehicles as they are converted (JSON Lines are always streamed)
+        self.json_lines = args.jsonl
+        self.stream = args.stream or args.jsonl
+        # the hash split doesn't need all vehicles to split them
+        self.streaming = self.stream or self.split == "hash"
 
         # output paths
-        self.train_path = f"{self.output_path}{os.path.sep}train.json"
-        self.eval_path = f"{self.output_path}{os.path.sep}test.json"
+        extension = "jsonl" if self.json_lines else "json"
+        self.train_path = f"{self.output_path}{os.path.sep}train.{extension}"
+        self.eval_path = f"{self.output_path}{os.path.sep}test.{extension}"
 
         # list of vehicles to put to final files
         self.vehicles: List[Dict[str, Any]] = []
+        # streaming output (see begin)
+        self.train_writer: Optional[JsonArrayWriter] = None
+        self.eval_writer: Optional[JsonArrayWriter] = None
 
         # parameters that might be needed in files but we are not changing
         #! these could be changed, but probably won't
         self.label: str = "vehicle"
 
-    def _parse_shapes(self, shapes: List[Dict[str, Any]]) -> List[Tuple[str, Bbox, Bbox]]:
+    def __getstate__(self) -> Dict[str, Any]:
+        # worker processes (--jobs) don't need the already converted vehicles nor the output
+        state = super().__getstate__()
+        state["vehicles"] = []
+        state["train_writer"] = None
+        state["eval_writer"] = None
+        return state
+
+    def _get_params(self) -> Dict[str, Any]:
+        params = super()._get_params()
+        params["allow_multiple"] = self.allow_multiple
+        params["label"] = self.label
+        return params
+
+    def _parse_shapes(self, shapes: List[Shape]) -> List[Tuple[str, Bbox, Bbox]]:
         vehicles, colors = self._sort_labels(shapes)
         # * pair vehicles with colors
         objects: List[Tuple[str, Bbox, Bbox]] = []
+        index = RectIndex([vehicle[1] for vehicle in vehicles])
         for color in colors:
             color_center: Point = [(color[0] + color[2]) / 2,
                                    (color[1] + color[3]) / 2]
-            for vehicle in vehicles:
-                if _is_point_in_rect(color_center, vehicle[1]):
-                    objects.append(vehicle + (color,))
-                    break  # vehicle loop
+            # first vehicle that contains the center
+            vehicle_index = index.first_containing(color_center)
+            if vehicle_index is not None:
+                objects.append(vehicles[vehicle_index] + (color,))
         # * raise errors if something went wrong
         if len(objects) < 1:
             if len(colors) < 1:
@@ -78,37 +96,30 @@ class AttributesConverter(Converter):
                 "Multiple objects in one annotation file is disabled")
         return objects
 
-    def _sort_labels(self, shapes: List[Dict[str, Any]]) -> Tuple[List[Vehicle], List[Bbox]]:
+    def _sort_labels(self, shapes: List[Shape]) -> Tuple[List[Vehicle], List[Bbox]]:
         vehicles: List[Tuple[str, Bbox]] = []
         colors: List[Bbox] = []
         for shape in shapes:
-            if shape["label"] == "vehicle":
+            if shape.label == "vehicle":
                 vehicles.append((
                     self._type_from_flags(shape, self.vehicle_types),
                     self._parse_bbox(shape)
                 ))
-            elif shape["label"] == "color":
+            elif shape.label == "color":
                 colors.append(self._parse_bbox(shape, round_digits=0))
             else:
                 raise ValueError("Unknown label")
         return (vehicles, colors)
 
-    def _parse_bbox(self, shape: Dict[str, Any], round_digits=1) -> Bbox:
-        bbox = shape["points"][0] + shape["points"][1]
-        for i in range(len(bbox)):
-            bbox[i] = round_to_digits(bbox[i], round_digits)
-        # change bbox to format Xmin, Ymin, Xmax, Ymax
-        bbox[0], bbox[2] = min(bbox[0], bbox[2]), max(bbox[0], bbox[2])
-        bbox[1], bbox[3] = min(bbox[1], bbox[3]), max(bbox[1], bbox[3])
-        return bbox
-
-    def convert_file(self, path: str) -> Dict[str, Any]:
-        with open(path) as file:
-            old: Dict[str, Any] = load(file)
-        if not self._is_annotation_file(old):
-            raise ValueError("Not in labelme format")
+    def _parse_bbox(self, shape: Shape, round_digits=1) -> Bbox:
+        # rounding keeps the order, so the corners can be ordered first
+        bbox = shape.bbox()
+        return [round_to_digits(bbox.x_min, round_digits), round_to_digits(bbox.y_min, round_digits),
+                round_to_digits(bbox.x_max, round_digits), round_to_digits(bbox.y_max, round_digits)]
+
+    def convert_annotation(self, path: str, old: Annotation) -> Dict[str, Any]:
         new: Dict[str, Any] = {}
-        objects = self._parse_shapes(old["shapes"])
+        objects = self._parse_shapes(old.shapes)
         new["objects"] = [{
             "label": self.label,
             "attributes": {
@@ -117,49 +128,62 @@ class AttributesConverter(Converter):
             },
             "bbox": obj_bbox
         } for veh_type, obj_bbox, color_bbox in objects]
-        path_to_img = os.path.join(Path(path).parent, old["imagePath"])
+        path_to_img = os.path.join(Path(path).parent, old.image_path)
         new["image"] = self._get_data_path(path_to_img)
         return new
 
-    def convert(self) -> None:
-        self._handle_files_exist([self.train_path, self.eval_path])
-        start = time()
-        read_files = 0
-        converted_files = 0
-        # * convert loop
-        for path in self.finder.find_all():
-            try:
-                self.vehicles.append(self.convert_file(path))
-                converted_files += 1
-            except ValueError as e:
-                logger.warning(f"Bad format, skipping {path} ({e})")
-            read_files += 1
-        # * write files
+    def output_files(self) -> List[str]:
+        return [self.train_path, self.eval_path]
+
+    def begin(self, files: Dict[str, List[str]]) -> None:
+        """
+        With streaming, every vehicle is written as soon as it is converted, so memory doesn't grow with the dataset.
+        Files are not shuffled.
+        """
+        super().begin(files)
+        if not self.streaming:
+            return
+        self._sample_eval_files(files[self.finder.data_extension])
+        self.train_writer = open_json_writer(self.train_path, self.json_lines)
+        self.eval_writer = open_json_writer(self.eval_path, self.json_lines)
+
+    def add(self, path: str, result: Dict[str, Any]) -> None:
+        if not self.streaming:
+            self.vehicles.append(result)
+            return
+        (self.eval_writer if self._is_eval(path) else self.train_writer).write(result)
+
+    def finish(self) -> None:
+        if self.streaming:
+            self._finish_streaming()
+        else:
+            self._finish_in_memory()
+
+    def _finish_in_memory(self) -> None:
         shuffle(self.vehicles)
         if self.dedic_eval_path is None:
             split_num = int(len(self.vehicles) * self.eval_percent / 100)
             with open(self.train_path, "w") as train_file:
-                train_file.write(dumps(self.vehicles[split_num:],
-                                       separators=(",", ":")))
+                train_file.write(dumps(self.vehicles[split_num:]))
             with open(self.eval_path, "w") as test_file:
-                test_file.write(dumps(self.vehicles[:split_num],
-                                      separators=(",", ":")))
+                test_file.write(dumps(self.vehicles[:split_num]))
         else:
             logger.warning("This feature was not tested yet, be careful!")
             with open(self.train_path, "w") as train_file:
-                train_file.write(dumps(self.vehicles, separators=(",", ":")))
-            # we need to convert eval_path to config.json
-            eval_vehicles: List[Dict[str, Any]] = []
-            for eval_path in Finder(self.dedic_eval_path, "", "json").find_all():
-                try:
-                    eval_vehicles.append(self.convert_file(eval_path))
-                except ValueError as e:
-                    logger.warning(f"Bad format, skipping {eval_path} ({e})")
+                train_file.write(dumps(self.vehicles))
+            eval_vehicles = list(self._convert_dedicated())
             shuffle(eval_vehicles)
             with open(self.eval_path, "w") as eval_file:
-                eval_file.write(dumps(eval_vehicles, separators=(",", ":")))
-        logger.success(
-            f"Converted {converted_files} files ({read_files} read) in {round_to_digits(time() - start, 6)} s")
+                eval_file.write(dumps(eval_vehicles))
+
+    def _finish_streaming(self) -> None:
+        assert self.train_writer is not None and self.eval_writer is not None
+        with self.train_writer, self.eval_writer:
+            if self.dedic_eval_path is not None:
+                logger.warning("This feature was not tested yet, be careful!")
+                for vehicle in self._convert_dedicated():
+                    self.eval_writer.write(vehicle)
+        self.train_writer = self.eval_writer = None
 
     @classmethod
     def add_parser_arguments(cls, parser: argparse.ArgumentParser):
@@ -167,3 +191,9 @@ class AttributesConverter(Converter):
         parser.add_argument("--no_multiple", action="store_const",
                             const=False, default=defaults.ATTR_MULTIPLE,
                             help="Whether to skip files with multiple vehicles")
+        parser.add_argument("--stream", action="store_const",
+                            const=not defaults.ATTR_STREAM, default=defaults.ATTR_STREAM,
+                            help="Whether to write vehicles as they are converted (constant memory, not shuffled)")
+        parser.add_argument("--jsonl", action="store_const",
+                            const=not defaults.ATTR_JSONL, default=defaults.ATTR_JSONL,
+                            help="Whether to write JSON Lines (train.jsonl, test.jsonl) instead of json arrays, implies --stream")
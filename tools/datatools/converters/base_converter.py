@@ -2,16 +2,116 @@ import argparse
 import os
 
 from abc import ABCMeta, abstractmethod
-from json import load
-from typing import Any, Dict, List, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from random import sample
+from time import time
+from typing import Any, Callable, Deque, Dict, Generator, Iterable, List, Optional, Set, Tuple
 
 from .. import defaults
+from ..annotation_cache import AnnotationCache
+from ..dedup import exclude_duplicates, find_duplicates
+from ..filecache import Fingerprint
 from ..finder import Finder
+from ..geometry import drop_shapes, lint_annotation
+from ..imagesize import image_size
+from ..jsonio import load
+from ..labelme import read_labelme, read_labelme_fingerprinted
 from ..logger import get_logger
-from ..util import base_off_cwd, get_relpath
+from ..manifest import Manifest
+from ..records import Annotation, Shape
+from ..split import HashSplit
+from ..util import PathResolver, base_off_cwd, round_to_digits
 
 logger = get_logger()
 
+# (path, result of convert_file, error message if the file was skipped)
+ConvertResult = Tuple[str, Any, Optional[str]]
+# (result of convert_file, error message if the file was skipped), a result with an error is passed to skip
+TryResult = Tuple[Any, Optional[str]]
+# (path, one TryResult for every converter, shape issues found when parsing, see Converter._lint)
+MultiResult = Tuple[str, List[TryResult], List[str]]
+# (path, indices of the converters that need the file converted)
+ConvertTask = Tuple[str, Tuple[int, ...]]
+# (fingerprint of the parsed file with --incremental, shape issues, one TryResult for every needed converter)
+TaskResult = Tuple[Optional[Fingerprint], List[str], List[TryResult]]
+
+# annotation files per worker task (parsed once, then converted by all formats)
+CHUNK_SIZE = 64
+
+# images compared by --dedup
+DEDUP_EXTENSION = "jpg"
+
+# converter instances of the current worker process (set by _init_worker)
+_worker_converters: "List[Converter]" = []
+
+
+def _init_worker(converters: "List[Converter]") -> None:
+    global _worker_converters
+    # forked workers get the state of the main process, the cache is read again when needed
+    for converter in converters:
+        converter.manifest = None
+        converter.annotation_cache = None
+    _worker_converters = converters
+
+
+def _convert_tasks(converters: "List[Converter]", tasks: List[ConvertTask]) -> List[TaskResult]:
+    """
+    Parses every annotation once, then each converter converts all of its files at once \
+        (see Converter.convert_annotations).
+    With --incremental, the manifests get the fingerprint of the content that was actually parsed.
+    Shape issues are returned, so they are logged in order even from worker processes.
+    """
+    fingerprinted = any(converter.incremental for converter in converters)
+    parsed: List[Tuple[Optional[Annotation], Optional[str]]] = []
+    fingerprints: List[Optional[Fingerprint]] = []
+    issues: List[List[str]] = []
+    for path, _ in tasks:
+        fingerprint = None
+        found: List[str] = []
+        try:
+            if fingerprinted:
+                old, fingerprint = converters[0]._read_fingerprinted(path)
+            else:
+                old = converters[0]._read_annotation(path)
+            old, found = converters[0]._lint(old)
+            parsed.append((old, None))
+        except ValueError as e:
+            parsed.append((None, str(e)))
+        fingerprints.append(fingerprint)
+        issues.append(found)
+    converted: List[Dict[int, TryResult]] = [{} for _ in tasks]
+    for index, converter in enumerate(converters):
+        batch = [task for task, (_, needed) in enumerate(tasks)
+                 if index in needed and parsed[task][1] is None]
+        results = converter.convert_annotations([(tasks[task][0], parsed[task][0]) for task in batch])
+        for task, result in zip(batch, results):
+            converted[task][index] = result
+    # files that couldn't be parsed have the same error for every converter
+    return [(fingerprints[task], issues[task],
+             [converted[task].get(index, (None, parsed[task][1])) for index in needed])
+            for task, (_, needed) in enumerate(tasks)]
+
+
+def _log_issues(path: str, issues: List[str]) -> None:
+    for issue in issues:
+        logger.warning(f"{issue} in {path}")
+
+
+def _convert_chunk(tasks: List[ConvertTask]) -> List[TaskResult]:
+    return _convert_tasks(_worker_converters, tasks)
+
+
+def _chunks(iterable: Iterable[str], size: int) -> Generator[List[str], None, None]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
 
 class ConverterArgs(argparse.Namespace):
     exec: str
@@ -23,20 +123,64 @@ class ConverterArgs(argparse.Namespace):
     force: bool
     val: int
     dedicated: Optional[str]
+    jobs: int
+    cache: str
+    listing_cache: bool
+    walk_threads: int
+    sort_files: bool
+    incremental: bool
+    annotation_cache: bool
+    split: str
+    seed: int
+    check_size: bool
+    dedup: str
+    geometry: str
+    duplicate_iou: float
+
+
+def create_finder(args: ConverterArgs) -> Finder:
+    cache_path = os.path.join(args.cache, "listing.json") if args.listing_cache else None
+    return Finder(args.input, args.prefix, args.data_extension, cache_path,
+                  args.walk_threads, args.sort_files)
 
 
 class Converter(metaclass=ABCMeta):
+    # extensions searched for besides the data extension (see begin)
+    extra_extensions: Tuple[str, ...] = ()
+
     def __init__(self, finder: Finder, args: ConverterArgs):
         self.finder = finder
         self.output_path = args.output
         self.exec_path = args.exec
         self.absolute_paths = args.absolute
+        self.path_resolver = PathResolver(self.exec_path, self.absolute_paths)
 
         self.force = args.force
+        self.jobs = args.jobs
+        self.cache_dir = args.cache
+        # created on first use, because subclasses add parameters (see _get_params)
+        self.incremental = args.incremental
+        self.manifest: Optional[Manifest] = None
+        # parsed annotations shared by all converters (loaded by _refresh_annotations)
+        self.annotation_cache_path = os.path.join(self.cache_dir, "annotations.bin") \
+            if args.annotation_cache else None
+        self.annotation_cache: Optional[AnnotationCache] = None
 
         self.mode = "dedic" if args.dedicated is None else "perc"
         self.eval_percent = args.val
         self.dedic_eval_path = args.dedicated
+        # "random" shuffles all files, "hash" decides every file by its path (see HashSplit)
+        self.split = args.split
+        self.hash_split = HashSplit(args.input, args.val, args.seed)
+        # evaluation files of the random split for streamed output (see _sample_eval_files)
+        self.eval_files: Set[str] = set()
+        # compare image headers with the annotated size (only formats with the --check_size argument)
+        self.check_size = getattr(args, "check_size", defaults.CHECK_SIZE)
+        # images with the same content ("off", "report" or "exclude")
+        self.dedup = args.dedup
+        # shape geometry checks ("off", "report" or "drop"), see _lint
+        self.geometry = args.geometry
+        self.duplicate_iou = args.duplicate_iou
         self._handle_output_noexist()
 
         self._set_types()
@@ -70,38 +214,259 @@ class Converter(metaclass=ABCMeta):
                 os.remove(path)
                 logger.info(f"Deleted {path}")
 
-    def _type_from_flags(self, shape: Dict[str, Dict[str, bool]], selection):
-        for flag, value in shape["flags"].items():
-            if value and flag in selection:
-                return flag
-        raise ValueError("No known flag specified")
+    def _type_from_flags(self, shape: Shape, selection):
+        return shape.selected_flag(selection)
+
+    def _is_annotation_file(self, file: Annotation):
+        return file.has_all_keys() or not defaults.CHECK_UNUSED_PARAMS
+
+    def _get_data_path(self, path: str) -> str:
+        return self.path_resolver.resolve(path)
+
+    def _get_params(self) -> Dict[str, Any]:
+        """
+        Parameters that affect convert_file results (a changed parameter invalidates the manifest).
+        """
+        return {
+            "converter": type(self).__name__,
+            "vehicle_types": self.vehicle_types,
+            "exec": os.path.abspath(self.exec_path),
+            "absolute": self.absolute_paths,
+            "check_unused": defaults.CHECK_UNUSED_PARAMS,
+            "check_size": self.check_size,
+            # reporting doesn't change results
+            "drop_iou": self.duplicate_iou if self.geometry == "drop" else None,
+        }
+
+    def _get_output_files(self, result: Any) -> List[str]:
+        """
+        Files written by convert_file (an input is converted again if they change).
+        """
+        return []
+
+    def _get_manifest(self) -> Optional[Manifest]:
+        if self.incremental and self.manifest is None:
+            self.manifest = Manifest(
+                os.path.join(self.cache_dir, f"manifest-{type(self).__name__}.json"), self._get_params())
+        return self.manifest
+
+    def _save_manifest(self) -> None:
+        if self.manifest is not None:
+            self.manifest.save()
+
+    def _lookup(self, path: str) -> Tuple[bool, Any]:
+        """
+        Returns (True, result) if the file doesn't need to be converted again (--incremental).
+        """
+        manifest = self._get_manifest()
+        if manifest is None:
+            return (False, None)
+        return manifest.lookup(path)
+
+    def _get_image_file(self, result: Any) -> Optional[str]:
+        """
+        Image of a convert_file result (checked with --check_size).
+        """
+        return None
+
+    def _check_image_size(self, image_path: str, old: Annotation, output_path: Optional[str] = None) -> None:
+        """
+        Raises ValueError if the image header doesn't match the annotated size (with --check_size).
+        Only the header is read, images of unknown formats are not checked.
+        output_path (written next to the image by an earlier export) is removed then, so it isn't used with the image.
+        """
+        if not self.check_size:
+            return
+        try:
+            size = image_size(image_path)
+            error = None
+        except OSError:
+            error = "Image not found"
+        if error is None and size is not None and size != (old.image_width, old.image_height):
+            error = f"Image is {size[0]}x{size[1]}, but annotated as {old.image_width}x{old.image_height}"
+        if error is None:
+            return
+        if output_path is not None:
+            try:
+                os.remove(output_path)
+            except FileNotFoundError:
+                pass
+        raise ValueError(error)
+
+    def _record(self, path: str, result: Any, fingerprint: Fingerprint) -> None:
+        if self.manifest is None:
+            return
+        outputs = self._get_output_files(result)
+        image = self._get_image_file(result) if self.check_size else None
+        # a changed image is checked again, like a changed output is written again
+        self.manifest.record(path, result, outputs if image is None else outputs + [image], fingerprint)
+
+    def _refresh_annotations(self, paths: Iterable[str], map_function: Callable) -> Iterable[str]:
+        """
+        Parses new and changed annotations into the annotation cache (if enabled) and saves it, \
+            so worker processes can read it.
+        """
+        if self.annotation_cache_path is None:
+            return paths
+        paths = list(paths)
+        if self.annotation_cache is None:
+            self.annotation_cache = AnnotationCache(self.annotation_cache_path)
+        self.annotation_cache.refresh(paths, map_function)
+        self.annotation_cache.save()
+        return paths
+
+    def _read_annotation(self, path: str) -> Annotation:
+        old = None
+        if self.annotation_cache_path is not None:
+            if self.annotation_cache is None:
+                self.annotation_cache = AnnotationCache(self.annotation_cache_path)
+            old = self.annotation_cache.get(path)
+        if old is None:
+            return self._annotation_from_dict(read_labelme(path))
+        if not self._is_annotation_file(old):
+            raise ValueError("Not in labelme format")
+        return old
+
+    def _read_fingerprinted(self, path: str) -> Tuple[Annotation, Fingerprint]:
+        """
+        Reads an annotation together with the fingerprint of the parsed content (for the manifest), \
+            the annotation cache is not used, its entry could be of an older content.
+        """
+        file, fingerprint = read_labelme_fingerprinted(path)
+        return (self._annotation_from_dict(file), fingerprint)
 
-    def _is_annotation_file(self, file: Dict[str, Any]):
+    def _annotation_from_dict(self, file: Dict[str, Any]) -> Annotation:
         try:
-            secondary_data = []
-            if defaults.CHECK_UNUSED_PARAMS:
-                secondary_data.append(file["version"])
-                secondary_data.append(file["flags"])
-                secondary_data.append(file["imageData"])
-            secondary_data.append(file["shapes"])
-            secondary_data.append(file["imagePath"])
-            secondary_data.append(file["imageHeight"])
-            secondary_data.append(file["imageWidth"])
-            del secondary_data
-            return True
-        except KeyError:
+            old = Annotation.from_dict(file)
+        except (KeyError, TypeError):
+            raise ValueError("Not in labelme format") from None
+        if not self._is_annotation_file(old):
+            raise ValueError("Not in labelme format")
+        return old
+
+    def _lint(self, old: Annotation) -> Tuple[Annotation, List[str]]:
+        """
+        Finds shapes without area, outside of the image or duplicated (--geometry), \
+            returns the annotation (with drop without them) and a message for each.
+        """
+        if self.geometry == "off":
+            return (old, [])
+        issues = lint_annotation(old, self.duplicate_iou)
+        if not issues:
+            return (old, [])
+        dropped = " (dropped)" if self.geometry == "drop" else ""
+        messages = [f"Shape {issue.index} ({old.shapes[issue.index].label}) {issue.message}{dropped}"
+                    for issue in issues]
+        return (drop_shapes(old, issues) if self.geometry == "drop" else old, messages)
+
+    def _convert_all(self, paths: Iterable[str]) -> Generator[ConvertResult, None, None]:
+        """
+        Converts all paths with this converter (see convert_all): chunks of files are parsed \
+            and passed to convert_annotations, either serially or in a process pool (--jobs).
+        Results are yielded in the same order as paths, errors are returned instead of raised \
+            and shape issues are logged.
+        With --incremental, unchanged files are not converted again.
+        """
+        for path, [(result, error)], issues in convert_all([self], paths):
+            _log_issues(path, issues)
+            yield (path, result, error)
+
+    def _sample_eval_files(self, paths: List[str]) -> None:
+        """
+        Chooses evaluation files beforehand for output that is written as files are converted \
+            (only paths are kept in memory), the hash split decides every file on its own.
+        """
+        if self.split != "hash" and self.dedic_eval_path is None:
+            self.eval_files = set(sample(paths, int(len(paths) * self.eval_percent / 100)))
+
+    def _is_eval(self, path: str) -> bool:
+        if self.dedic_eval_path is not None:
             return False
+        if self.split == "hash":
+            return self.hash_split.is_eval(path)
+        return path in self.eval_files
 
-    def _get_data_path(self, path):
-        return os.path.abspath(path) if self.absolute_paths else get_relpath(self.exec_path, path)
+    def _convert_dedicated(self) -> Generator[Any, None, None]:
+        """
+        Converts the dedicated evaluation files (--dedicated), yields results of the valid ones.
+        """
+        eval_paths = self.finder.sub_finder(self.dedic_eval_path, "", self.finder.data_extension).find_all()
+        for eval_path, result, error in self._convert_all(eval_paths):
+            if error is None:
+                yield result
+            else:
+                logger.warning(f"Bad format, skipping {eval_path} ({error})")
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # worker processes (--jobs) don't need the manifest and read the annotation cache themselves
+        state = self.__dict__.copy()
+        state["manifest"] = None
+        state["annotation_cache"] = None
+        state["eval_files"] = set()
+        return state
+
+    def convert_file(self, path: str) -> Any:
+        return self.convert_annotation(path, self._read_annotation(path))
+
+    @abstractmethod
+    def convert_annotation(self, path: str, old: Annotation) -> Any:
+        """
+        Converts a parsed labelme file (path is the path of the annotation file).
+        """
+
+    def convert_annotations(self, annotations: List[Tuple[str, Annotation]]) -> List[TryResult]:
+        """
+        Converts a chunk of parsed files at once, errors are returned instead of raised.
+        Override to process all files of a chunk together.
+        """
+        results: List[TryResult] = []
+        for path, old in annotations:
+            try:
+                results.append((self.convert_annotation(path, old), None))
+            except ValueError as e:
+                results.append((None, str(e)))
+        return results
+
+    def output_files(self) -> List[str]:
+        """
+        Files written by finish (formats exported together must not share them).
+        """
+        return []
+
+    def begin(self, files: Dict[str, List[str]]) -> None:
+        """
+        Prepares the output before conversion.
+        files are the search results for the data extension and extra_extensions ({extension: [paths]}).
+        """
+        self._handle_files_exist(self.output_files())
 
     @abstractmethod
-    def convert_file(self, path):
-        pass
+    def add(self, path: str, result: Any) -> None:
+        """
+        Receives the result of every successfully converted file (in search order).
+        """
+
+    def skip(self, path: str, result: Any) -> None:
+        """
+        Receives the files that were not converted instead of add (result is None, \
+            unless convert_annotations returned one with the error).
+        """
 
     @abstractmethod
+    def finish(self) -> None:
+        """
+        Writes the rest of the output after all files were converted.
+        """
+
     def convert(self) -> None:
-        pass
+        convert_many([self])
+
+    @classmethod
+    def _add_check_size_argument(cls, parser: argparse.ArgumentParser):
+        parser.add_argument("--check_size", action="store_const",
+                            const=not defaults.CHECK_SIZE, default=defaults.CHECK_SIZE,
+                            help="Whether to skip files whose image size (read from the image header) \
+                                differs from imageWidth and imageHeight")
 
     @classmethod
     def add_parser_arguments(cls, parser: argparse.ArgumentParser):
@@ -121,9 +486,183 @@ class Converter(metaclass=ABCMeta):
         parser.add_argument("-f", "--force", action="store_const",
                             const=not defaults.FORCE_OVERRIDE, default=defaults.FORCE_OVERRIDE,
                             help="Force deletion of existing config files")
+        parser.add_argument("-j", "--jobs", type=int, default=defaults.JOBS, metavar="N",
+                            help="How many processes convert files (1 = no worker processes)")
+        parser.add_argument("--cache", default=defaults.CACHE_PATH, metavar="PATH",
+                            help="Directory for cache files")
+        parser.add_argument("--listing_cache", action="store_const",
+                            const=not defaults.LISTING_CACHE, default=defaults.LISTING_CACHE,
+                            help="Whether to cache directory listings (only changed directories are rescanned)")
+        parser.add_argument("--walk_threads", type=int, default=defaults.WALK_THREADS, metavar="N",
+                            help="How many directories are scanned at once (useful on network drives)")
+        parser.add_argument("--sort_files", action="store_const",
+                            const=not defaults.SORT_FILES, default=defaults.SORT_FILES,
+                            help="Whether to search files in a deterministic (sorted) order")
+        parser.add_argument("--incremental", action="store_const",
+                            const=not defaults.INCREMENTAL, default=defaults.INCREMENTAL,
+                            help="Whether to convert only files that changed since the last export")
+
+        parser.add_argument("--annotation_cache", action="store_const",
+                            const=not defaults.ANNOTATION_CACHE, default=defaults.ANNOTATION_CACHE,
+                            help="Whether to keep parsed annotations in a binary cache shared by all formats")
+        parser.add_argument("--split", choices=["random", "hash"], default=defaults.SPLIT,
+                            help="How to split files to train and evaluation sets \
+                                (hash = stable split by path, doesn't change between exports)")
+        parser.add_argument("--seed", type=int, default=defaults.SPLIT_SEED,
+                            help="Seed of the hash split")
+        parser.add_argument("--dedup", choices=["off", "report", "exclude"], default=defaults.DEDUP,
+                            help="Whether to report images with the same content \
+                                or to export only the first one (and its annotation)")
+        parser.add_argument("--geometry", choices=["off", "report", "drop"], default=defaults.GEOMETRY,
+                            help="Whether to report rectangles without area, outside of the image \
+                                or duplicated (see --duplicate_iou), or to also leave them out of the export")
+        parser.add_argument("--duplicate_iou", type=float, default=defaults.DUPLICATE_IOU, metavar="IOU",
+                            help="Rectangles of the same label overlapping at least this much are duplicates")
 
         eval_group = parser.add_mutually_exclusive_group()
         eval_group.add_argument("-v", "--val", "--evaluation_percent", type=int, default=defaults.EVALUATION_PERCENT,
                                 help="Percentage of all files to add into evaluation file")
         eval_group.add_argument("-d", "--dedicated", "--dedicated_evaluation_path", metavar="PATH", default=None, type=str,
                                 help="Whether to have dedicated evaluation images")
+
+
+def _lookup_chunk(converters: List[Converter], chunk: List[str]) -> Tuple[List[Dict[int, Any]], List[ConvertTask]]:
+    """
+    Splits a chunk to results that are still valid in the manifests \
+        ({converter index: result} for every path) and files to convert.
+    """
+    cached: List[Dict[int, Any]] = []
+    tasks: List[ConvertTask] = []
+    for path in chunk:
+        found: Dict[int, Any] = {}
+        needed: List[int] = []
+        for index, converter in enumerate(converters):
+            valid, result = converter._lookup(path)
+            if valid:
+                found[index] = result
+            else:
+                needed.append(index)
+        cached.append(found)
+        if needed:
+            tasks.append((path, tuple(needed)))
+    return (cached, tasks)
+
+
+def _merge_chunk(converters: List[Converter], chunk: List[str], cached: List[Dict[int, Any]],
+                 converted: List[TaskResult]) -> Generator[MultiResult, None, None]:
+    converted_files = iter(converted)
+    for path, found in zip(chunk, cached):
+        fingerprint, issues, fresh_results = \
+            next(converted_files) if len(found) < len(converters) else (None, [], [])
+        fresh = iter(fresh_results)
+        results: List[TryResult] = []
+        for index, converter in enumerate(converters):
+            if index in found:
+                results.append((found[index], None))
+                continue
+            result, error = next(fresh)
+            if error is None and fingerprint is not None:
+                converter._record(path, result, fingerprint)
+            results.append((result, error))
+        yield (path, results, issues)
+
+
+def convert_all(converters: List[Converter], paths: Iterable[str]) -> Generator[MultiResult, None, None]:
+    """
+    Converts all paths with every converter, parsing each annotation only once.
+    Runs serially or in a process pool, as set on the first converter (--jobs).
+    Results are yielded in the same order as paths, errors are returned instead of raised.
+    """
+    first = converters[0]
+    if first.jobs <= 1:
+        paths = first._refresh_annotations(paths, map)
+        for chunk in _chunks(paths, CHUNK_SIZE):
+            cached, tasks = _lookup_chunk(converters, chunk)
+            results = _convert_tasks(converters, tasks)
+            yield from _merge_chunk(converters, chunk, cached, results)
+        return
+    # workers get a copy of the converters, so only convert_annotation results make it back
+    with ProcessPoolExecutor(first.jobs, initializer=_init_worker, initargs=(converters,)) as executor:
+        paths = first._refresh_annotations(paths, partial(executor.map, chunksize=CHUNK_SIZE))
+        in_flight: Deque = deque()
+        for chunk in _chunks(paths, CHUNK_SIZE):
+            cached, tasks = _lookup_chunk(converters, chunk)
+            in_flight.append((chunk, cached, executor.submit(_convert_chunk, tasks)))
+            # keep all workers busy, but don't read ahead the whole dataset
+            if len(in_flight) > first.jobs * 2:
+                chunk, cached, future = in_flight.popleft()
+                yield from _merge_chunk(converters, chunk, cached, future.result())
+        while in_flight:
+            chunk, cached, future = in_flight.popleft()
+            yield from _merge_chunk(converters, chunk, cached, future.result())
+
+
+def _dedup_files(converter: Converter, files: Dict[str, List[str]]) -> None:
+    """
+    Reports duplicate images (--dedup), with exclude they are also removed from the search results.
+    """
+    groups = find_duplicates(files[DEDUP_EXTENSION], os.path.join(converter.cache_dir, "image_hashes.json"),
+                             converter.jobs)
+    for group in groups:
+        logger.warning(f"Same images: {', '.join(group)}")
+    if converter.dedup == "exclude":
+        removed = exclude_duplicates(files, groups, DEDUP_EXTENSION, converter.finder.data_extension)
+        logger.info(f"Excluded {removed} duplicate images")
+
+
+def check_formats(converters: List[Converter]) -> None:
+    """
+    Raises ValueError if the formats can't be exported in one pass (see convert_many).
+    """
+    first = converters[0]
+    search = (first.finder.search_root, first.finder.data_prefix, first.finder.data_extension)
+    for converter in converters[1:]:
+        if (converter.finder.search_root, converter.finder.data_prefix, converter.finder.data_extension) != search:
+            raise ValueError("All formats must search the same files (--input, --prefix, --data_extension)")
+        if (converter.geometry, converter.duplicate_iou) != (first.geometry, first.duplicate_iou):
+            # every annotation is parsed (and checked) once for all formats
+            raise ValueError("All formats must check shapes the same way (--geometry, --duplicate_iou)")
+    outputs = [path for converter in converters for path in converter.output_files()]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("Formats would overwrite each other's files, use a different --output for each")
+
+
+def convert_many(converters: List[Converter]) -> None:
+    """
+    Exports the dataset to all formats in one pass: files are searched once, \
+        every annotation is parsed once and the result of each converter is passed to its add.
+    Raises ValueError if the formats don't fit together (see check_formats).
+    """
+    check_formats(converters)
+    first = converters[0]
+    extensions = [first.finder.data_extension]
+    for converter in converters:
+        extensions.extend(converter.extra_extensions)
+    if first.dedup != "off":
+        extensions.append(DEDUP_EXTENSION)
+    files = first.finder.find_all_dict(extensions)
+    if first.dedup != "off":
+        _dedup_files(first, files)
+    for converter in converters:
+        converter.begin(files)
+    # messages are only told apart when exporting multiple formats
+    prefixes = [f"{type(converter).__name__}: " if len(converters) > 1 else "" for converter in converters]
+    start = time()
+    read_files = 0
+    converted_files = [0] * len(converters)
+    for path, results, issues in convert_all(converters, files[first.finder.data_extension]):
+        _log_issues(path, issues)
+        for index, (converter, (result, error)) in enumerate(zip(converters, results)):
+            if error is None:
+                converter.add(path, result)
+                converted_files[index] += 1
+            else:
+                logger.warning(f"{prefixes[index]}Bad format, skipping {path} ({error})")
+                converter.skip(path, result)
+        read_files += 1
+    for converter in converters:
+        converter.finish()
+        converter._save_manifest()
+    for prefix, converted in zip(prefixes, converted_files):
+        logger.success(
+            f"{prefix}Converted {converted} files ({read_files} read) in {round_to_digits(time() - start, 6)} s")
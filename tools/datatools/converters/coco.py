@@ -0,0 +1,105 @@
+import argparse
+import os
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..logger import get_logger
+from ..records import Annotation, Shape
+from ..writers import CocoWriter
+from .base_converter import Converter, ConverterArgs, create_finder
+
+logger = get_logger()
+
+# [category id, Xmin, Ymin, width, height]
+CocoBox = List[float]
+
+
+class CocoConverter(Converter):
+    def __init__(self, args: ConverterArgs):
+        super().__init__(create_finder(args), args)
+
+        # output files
+        self.train_path = f"{self.output_path}{os.path.sep}instances_train.json"
+        self.eval_path = f"{self.output_path}{os.path.sep}instances_test.json"
+
+        # object classes (COCO ids start at 1)
+        self.categories: Dict[str, int] = {}
+        for index, name in enumerate(self.vehicle_types):
+            self.categories[name] = index + 1
+        self.train_writer: Optional[CocoWriter] = None
+        self.eval_writer: Optional[CocoWriter] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # worker processes (--jobs) don't write the output
+        state = super().__getstate__()
+        state["train_writer"] = None
+        state["eval_writer"] = None
+        return state
+
+    def _get_category(self, shape: Shape) -> Optional[int]:
+        if shape.label == "vehicle":
+            return self.categories[self._type_from_flags(shape, self.vehicle_types)]
+        return None
+
+    def convert_annotation(self, path: str, old: Annotation) -> Dict[str, Any]:
+        image_path = os.path.join(Path(path).parent, old.image_path)
+        self._check_image_size(image_path, old)
+        boxes: List[CocoBox] = []
+        for shape in old.shapes:
+            category = self._get_category(shape)
+            if category is not None:
+                bbox = shape.bbox()
+                boxes.append([category, bbox.x_min, bbox.y_min, bbox.width, bbox.height])
+        return {
+            "file_name": self._get_data_path(image_path),
+            "height": old.image_height,
+            "width": old.image_width,
+            "boxes": boxes,
+            "image_path": image_path,
+        }
+
+    def _get_image_file(self, result: Dict[str, Any]) -> str:
+        return result["image_path"]
+
+    def output_files(self) -> List[str]:
+        return [self.train_path, self.eval_path]
+
+    def begin(self, files: Dict[str, List[str]]) -> None:
+        """
+        Images are written as soon as they are converted, so memory doesn't grow with the dataset.
+        Files are not shuffled.
+        """
+        super().begin(files)
+        self._sample_eval_files(files[self.finder.data_extension])
+        categories = [{"id": category, "name": name, "supercategory": "vehicle"}
+                      for name, category in self.categories.items()]
+        self.train_writer = CocoWriter(self.train_path, categories)
+        self.eval_writer = CocoWriter(self.eval_path, categories)
+
+    def _write(self, writer: CocoWriter, result: Dict[str, Any]) -> None:
+        image = {key: result[key] for key in ("file_name", "height", "width")}
+        writer.write(image, [{
+            "category_id": category,
+            "bbox": [x, y, width, height],
+            "area": width * height,
+            "iscrowd": 0,
+        } for category, x, y, width, height in result["boxes"]])
+
+    def add(self, path: str, result: Dict[str, Any]) -> None:
+        assert self.train_writer is not None and self.eval_writer is not None
+        self._write(self.eval_writer if self._is_eval(path) else self.train_writer, result)
+
+    def finish(self) -> None:
+        assert self.train_writer is not None and self.eval_writer is not None
+        with self.train_writer, self.eval_writer:
+            if self.dedic_eval_path is not None:
+                logger.warning("This feature was not tested yet, be careful!")
+                for result in self._convert_dedicated():
+                    self._write(self.eval_writer, result)
+        self.train_writer = self.eval_writer = None
+
+    @classmethod
+    def add_parser_arguments(cls, parser: argparse.ArgumentParser):
+        super().add_parser_arguments(parser)
+        cls._add_check_size_argument(parser)
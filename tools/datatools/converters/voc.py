@@ -0,0 +1,131 @@
+import argparse
+import os
+
+from pathlib import Path
+from random import shuffle
+from typing import Any, Dict, List, Optional
+from xml.sax.saxutils import escape
+
+from ..logger import get_logger
+from ..records import Annotation, Shape
+from ..util import write_if_changed
+from .base_converter import Converter, ConverterArgs, create_finder
+
+logger = get_logger()
+
+# one VOC annotation per image, objects are added at the end
+VOC_TEMPLATE = """<annotation>
+\t<folder>{folder}</folder>
+\t<filename>{filename}</filename>
+\t<path>{path}</path>
+\t<source>
+\t\t<database>Unknown</database>
+\t</source>
+\t<size>
+\t\t<width>{width}</width>
+\t\t<height>{height}</height>
+\t\t<depth>3</depth>
+\t</size>
+\t<segmented>0</segmented>
+{objects}</annotation>
+"""
+
+VOC_OBJECT_TEMPLATE = """\t<object>
+\t\t<name>{name}</name>
+\t\t<pose>Unspecified</pose>
+\t\t<truncated>0</truncated>
+\t\t<difficult>0</difficult>
+\t\t<bndbox>
+\t\t\t<xmin>{xmin}</xmin>
+\t\t\t<ymin>{ymin}</ymin>
+\t\t\t<xmax>{xmax}</xmax>
+\t\t\t<ymax>{ymax}</ymax>
+\t\t</bndbox>
+\t</object>
+"""
+
+
+class VocConverter(Converter):
+    def __init__(self, args: ConverterArgs):
+        super().__init__(create_finder(args), args)
+
+        # output files (annotations are written next to the images)
+        self.train_path = f"{self.output_path}{os.path.sep}voc_train.txt"
+        self.eval_path = f"{self.output_path}{os.path.sep}voc_test.txt"
+
+        # images of converted files (see add)
+        self.train_images: List[str] = []
+        self.eval_images: List[str] = []
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # worker processes (--jobs) don't need the converted images
+        state = super().__getstate__()
+        state["train_images"] = []
+        state["eval_images"] = []
+        return state
+
+    def _get_vehicle_type(self, shape: Shape) -> Optional[str]:
+        if shape.label == "vehicle":
+            return self._type_from_flags(shape, self.vehicle_types)
+        return None
+
+    def _get_output_files(self, result: List[str]) -> List[str]:
+        return [result[0]]
+
+    def _get_image_file(self, result: List[str]) -> str:
+        return result[2]
+
+    def convert_annotation(self, path: str, old: Annotation) -> List[str]:
+        """
+        Writes the VOC annotation next to the image, returns [annotation path, image path in lists, image path].
+        Raises ValueError (before writing) if a vehicle doesn't have two [X, Y] corners (see Shape.bbox).
+        """
+        image_path = os.path.join(Path(path).parent, old.image_path)
+        output_path = image_path.rsplit('.', 1)[0] + ".xml"
+        self._check_image_size(image_path, old, output_path)
+        objects: List[str] = []
+        for shape in old.shapes:
+            vehicle_type = self._get_vehicle_type(shape)
+            if vehicle_type is not None:
+                bbox = shape.bbox()
+                objects.append(VOC_OBJECT_TEMPLATE.format(
+                    name=escape(vehicle_type),
+                    xmin=round(bbox.x_min), ymin=round(bbox.y_min),
+                    xmax=round(bbox.x_max), ymax=round(bbox.y_max),
+                ))
+        write_if_changed(output_path, VOC_TEMPLATE.format(
+            folder=escape(Path(image_path).parent.name),
+            filename=escape(Path(image_path).name),
+            path=escape(self._get_data_path(image_path)),
+            width=old.image_width,
+            height=old.image_height,
+            objects="".join(objects),
+        ))
+        return [output_path, self._get_data_path(image_path), image_path]
+
+    def output_files(self) -> List[str]:
+        return [self.train_path, self.eval_path]
+
+    def begin(self, files: Dict[str, List[str]]) -> None:
+        super().begin(files)
+        self._sample_eval_files(files[self.finder.data_extension])
+
+    def add(self, path: str, result: List[str]) -> None:
+        (self.eval_images if self._is_eval(path) else self.train_images).append(result[1])
+
+    def finish(self) -> None:
+        if self.dedic_eval_path is not None:
+            logger.warning("This feature was not tested yet, be careful!")
+            self.eval_images = [result[1] for result in self._convert_dedicated()]
+        if self.split != "hash":
+            shuffle(self.train_images)
+            shuffle(self.eval_images)
+        with open(self.train_path, "w") as train_file:
+            train_file.write("\n".join(self.train_images))
+        with open(self.eval_path, "w") as eval_file:
+            eval_file.write("\n".join(self.eval_images))
+
+    @classmethod
+    def add_parser_arguments(cls, parser: argparse.ArgumentParser):
+        super().add_parser_arguments(parser)
+        cls._add_check_size_argument(parser)
@@ -1,17 +1,16 @@
 import argparse
 import os
 
-from json import load
 from pathlib import Path
 from random import shuffle
-from time import time
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from .. import defaults
-from ..finder import Finder
+from ..bbox import BboxBatch, collect_labels, format_labels
 from ..logger import get_logger
-from ..util import round_to_digits
-from .base_converter import Converter, ConverterArgs
+from ..records import Annotation
+from ..util import write_if_changed
+from .base_converter import Converter, ConverterArgs, TryResult, create_finder
 from .export_yolov4_config import get_yolo_config
 
 logger = get_logger()
@@ -26,8 +25,10 @@ class YoloArgs(ConverterArgs):
 
 
 class YoloConverter(Converter):
+    extra_extensions = ("jpg",)
+
     def __init__(self, args: YoloArgs):
-        super().__init__(Finder(args.input, args.prefix, args.data_extension), args)
+        super().__init__(create_finder(args), args)
 
         # output files
         self.config_path = f"{self.output_path}{os.path.sep}yolov4.cfg"
@@ -36,6 +37,10 @@ class YoloConverter(Converter):
         self.eval_path = f"{self.output_path}{os.path.sep}test.txt"
         self.names_path = f"{self.output_path}{os.path.sep}names.txt"
         self.backup_path = args.backup
+        # images found by the search (see begin)
+        self.images: List[str] = []
+        # normalized paths of images rejected by --check_size (see skip)
+        self.rejected_images: Set[str] = set()
 
         # object classes
         self.classes: Dict[str, int] = {}
@@ -68,59 +73,80 @@ class YoloConverter(Converter):
         del old
         return True
 
-    def _get_vehicle_class(self, shape: Dict[str, Any]) -> Union[int, None]:
-        if (shape["label"] == "vehicle"):
-            return self.classes[self._type_from_flags(shape, self.vehicle_types)]
-        else:
-            return None
-
-    def _parse_bbox(self, shape: Dict[str, Any], height: int, width: int) -> Tuple[float, float, float, float]:
-        # x y x y
-        bbox: List[float] = shape["points"][0] + shape["points"][1]
-        # center of bbox relative to dimensions
-        center_x = (bbox[0] + bbox[2]) / 2 / width
-        center_y = (bbox[1] + bbox[3]) / 2 / height
-        # length of bbox relativeto dimensions
-        length_x = abs(bbox[0] - bbox[2]) / width
-        length_y = abs(bbox[1] - bbox[3]) / height
-        return (center_x, center_y, length_x, length_y)
-
     def _get_config(self):
         return get_yolo_config(len(self.classes), self.batch_size, self.subdivisions, self.height, self.width)
 
-    def convert_file(self, path: str):
-        with open(path) as file:
-            old: Dict[str, Any] = load(file)
-        if not self._is_annotation_file(old):
-            raise ValueError("Not in labelme format")
-        new: List[str] = []
-        height: int = old["imageHeight"]
-        width: int = old["imageWidth"]
-        for shape in old["shapes"]:
-            class_id = self._get_vehicle_class(shape)
-            if class_id is not None:
-                new.append(f"{class_id}" + " " +
-                           " ".join([str(value) for value in self._parse_bbox(shape, height, width)]))
-
-        output_path = os.path.join(
-            Path(path).parent, old['imagePath']).rsplit('.', 1)[0] + ".txt"
-        with open(output_path, "w") as file:
-            file.write("\n".join(new))
-
-    def convert(self) -> None:
-        self._handle_files_exist([self.data_path, self.config_path,
-                                  self.train_path, self.eval_path])
-        start = time()
-        converted_files = 0
-        read_files = 0
-        # * convert loop
-        for path in self.finder.find_all():
+    def _get_output_files(self, result: List[str]) -> List[str]:
+        return [result[0]]
+
+    def _get_image_file(self, result: List[str]) -> str:
+        return result[1]
+
+    def convert_annotation(self, path: str, old: Annotation) -> List[str]:
+        """
+        Writes the label file next to the image, returns [label path, image path].
+        """
+        [(result, error)] = self.convert_annotations([(path, old)])
+        if error is not None:
+            raise ValueError(error)
+        return result
+
+    def convert_annotations(self, annotations: List[Tuple[str, Annotation]]) -> List[TryResult]:
+        """
+        Normalizes bboxes of all files at once (see BboxBatch), then writes a label file for every file.
+        """
+        results: List[TryResult] = []
+        # (output path, class ids) of every valid file
+        labels: List[Tuple[str, List[int]]] = []
+        batch = BboxBatch()
+        for path, old in annotations:
+            image_path = os.path.join(Path(path).parent, old.image_path)
+            output_path = image_path.rsplit('.', 1)[0] + ".txt"
+            try:
+                self._check_image_size(image_path, old, output_path)
+            except ValueError as e:
+                # the image is left out of the lists (see skip)
+                results.append((image_path, str(e)))
+                continue
             try:
-                self.convert_file(path)
-                converted_files += 1
+                # bboxes of a skipped file are not written
+                class_ids = collect_labels(old, self.classes, batch)
             except ValueError as e:
-                logger.warning(f"Bad format, skipping {path} ({e})")
-            read_files += 1
+                results.append((None, str(e)))
+                continue
+            labels.append((output_path, class_ids))
+            results.append(([output_path, image_path], None))
+        # * write label files
+        rows = iter(batch.normalize())
+        for output_path, class_ids in labels:
+            lines = format_labels(class_ids, [next(rows) for _ in class_ids])
+            write_if_changed(output_path, "\n".join(lines))
+        return results
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # worker processes (--jobs) don't need the found images
+        state = super().__getstate__()
+        state["images"] = []
+        state["rejected_images"] = set()
+        return state
+
+    def output_files(self) -> List[str]:
+        return [self.data_path, self.config_path, self.train_path, self.eval_path]
+
+    def begin(self, files: Dict[str, List[str]]) -> None:
+        super().begin(files)
+        # annotations and images are found in one search
+        self.images = files["jpg"]
+
+    def add(self, path: str, result: List[str]) -> None:
+        # labels are written by convert_annotation
+        pass
+
+    def skip(self, path: str, result: Optional[str]) -> None:
+        if result is not None:
+            self.rejected_images.add(os.path.normpath(result))
+
+    def finish(self) -> None:
         # * write config files
         # * obj.data
         with open(self.data_path, "w") as data_file:
@@ -140,33 +166,40 @@ class YoloConverter(Converter):
             # to easily add yolo-tiny
             config_file.write(self._get_config())
         # * test.txt and train.txt
-        images = self.finder.find_all_list("jpg")
-        shuffle(images)
-        if self.dedic_eval_path is None:
-            # split images randomly
+        images = [image for image in self.images if os.path.normpath(image) not in self.rejected_images]
+        if self.dedic_eval_path is None and self.split == "hash":
+            # every image is decided by its path, no shuffle needed
+            train_images: List[str] = []
+            eval_images: List[str] = []
             for path in images:
-                path = self._get_data_path(path)
+                (eval_images if self.hash_split.is_eval(path) else train_images).append(path)
+            with open(self.train_path, "w") as train_file:
+                train_file.write("\n".join(map(self._get_data_path, train_images)))
+            with open(self.eval_path, "w") as eval_file:
+                eval_file.write("\n".join(map(self._get_data_path, eval_images)))
+        elif self.dedic_eval_path is None:
+            shuffle(images)
+            # split images randomly
             split_num = int(len(images) * self.eval_percent / 100)
             with open(self.train_path, "w") as train_file:
-                train_file.write("\n".join(images[split_num:]))
+                train_file.write("\n".join(map(self._get_data_path, images[split_num:])))
             with open(self.eval_path, "w") as eval_file:
-                eval_file.write("\n".join(images[:split_num]))
+                eval_file.write("\n".join(map(self._get_data_path, images[:split_num])))
         else:
             # dedicated eval path
+            shuffle(images)
             logger.warning("This feature was not tested yet, be careful!")
             with open(self.train_path, "w") as train_file:
-                train_file.write("\n".join(images))
-            eval_images = Finder(self.dedic_eval_path,
-                                 "", "jpg").find_all_list()
+                train_file.write("\n".join(map(self._get_data_path, images)))
+            eval_images = self.finder.sub_finder(self.dedic_eval_path, "", "jpg").find_all_list()
             shuffle(eval_images)
             with open(self.eval_path, "w") as eval_file:
-                eval_file.write("\n".join(eval_images))
-        logger.success(
-            f"Converted {converted_files} files ({read_files} read) in {round_to_digits(time() - start, 6)} s")
+                eval_file.write("\n".join(map(self._get_data_path, eval_images)))
 
     @classmethod
     def add_parser_arguments(cls, parser: argparse.ArgumentParser):
         super().add_parser_arguments(parser)
+        cls._add_check_size_argument(parser)
         parser.add_argument("-b", "--backup", default=defaults.YOLO_BACKUP_PATH, metavar="PATH",
                             help="Directory to store training weights")
 
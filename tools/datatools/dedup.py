@@ -0,0 +1,92 @@
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .filecache import JsonCache, file_stats, hash_file, is_racy
+
+# images hashed per worker task (whole images are read, so tasks are smaller than in export)
+HASH_CHUNK_SIZE = 32
+
+
+def _try_hash_file(path: str) -> Optional[str]:
+    try:
+        return hash_file(path)
+    except OSError:
+        return None
+
+
+class HashCache(JsonCache):
+    """
+    Content hashes of files, kept as long as the size and mtime of a file don't change.
+    """
+    version = 2
+
+    def digests(self, paths: List[str], jobs: int = 1) -> Dict[str, str]:
+        """
+        Returns {path: content hash} of all readable files, new and changed files are hashed \
+            in a process pool (if jobs > 1).
+        """
+        digests: Dict[str, str] = {}
+        missing: List[Tuple[str, str, Tuple[int, int]]] = []
+        for path in paths:
+            stats = file_stats(path)
+            if stats is None:
+                continue
+            key = os.path.abspath(path)
+            entry = self.entries.get(key)
+            if entry is not None and (entry[0], entry[1]) == stats:
+                digests[path] = entry[2]
+                self.keep(key, entry)
+            else:
+                missing.append((path, key, stats))
+        missing_paths = [path for path, _, _ in missing]
+        if jobs <= 1:
+            hashed = map(_try_hash_file, missing_paths)
+            self._add(missing, hashed, digests)
+        else:
+            with ProcessPoolExecutor(jobs) as executor:
+                hashed = executor.map(_try_hash_file, missing_paths, chunksize=HASH_CHUNK_SIZE)
+                self._add(missing, hashed, digests)
+        return digests
+
+    def _add(self, missing: List[Tuple[str, str, Tuple[int, int]]], hashed: Iterable[Optional[str]],
+             digests: Dict[str, str]) -> None:
+        now = time.time_ns()
+        for (path, key, stats), digest in zip(missing, hashed):
+            if digest is None:
+                continue
+            digests[path] = digest
+            # hashed again next time, the file could still change without changing its mtime
+            if not is_racy(stats[1], now):
+                self.keep(key, [stats[0], stats[1], digest])
+
+
+def find_duplicates(paths: List[str], cache_path: Optional[str] = None, jobs: int = 1) -> List[List[str]]:
+    """
+    Returns groups of files with the same content (every group is sorted, the first file is kept by exclude_duplicates).
+    """
+    cache = HashCache(cache_path)
+    digests = cache.digests(paths, jobs)
+    cache.save()
+    groups: Dict[str, List[str]] = {}
+    for path, digest in digests.items():
+        groups.setdefault(digest, []).append(path)
+    return sorted(sorted(group) for group in groups.values() if len(group) > 1)
+
+
+def exclude_duplicates(files: Dict[str, List[str]], groups: List[List[str]], image_extension: str,
+                       data_extension: str) -> int:
+    """
+    Removes all images of a duplicate group except the first one and annotations \
+        of the removed images (annotation with the same name in the same directory) from search results.
+    Returns the number of removed images.
+    """
+    removed = {os.path.abspath(path) for group in groups for path in group[1:]}
+    if not removed:
+        return 0
+    files[image_extension] = [path for path in files[image_extension] if os.path.abspath(path) not in removed]
+    files[data_extension] = [path for path in files[data_extension]
+                             if os.path.abspath(path).rsplit(".", 1)[0] + f".{image_extension}" not in removed]
+    return len(removed)
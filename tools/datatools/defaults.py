@@ -20,6 +20,8 @@ else:
 # * export.py
 # check unused parameters in annotation files
 CHECK_UNUSED_PARAMS = True
+# json library ("auto" = fastest installed of orjson, ujson, simdjson, else json)
+JSON_BACKEND = "auto"
 
 #! paths are based off cwd (not this file)
 # argument defaults
@@ -27,11 +29,25 @@ SAVE_ARGS = False
 EXEC_PATH = _base_off_cwd(f"..{_sep}..{_sep}..", __file__)
 OUTPUT_PATH = _base_off_cwd(f"..{_sep}..{_sep}config", __file__)
 INPUT_PATH = _base_off_cwd(f"..{_sep}..{_sep}data", __file__)
+CACHE_PATH = _base_off_cwd(f"..{_sep}..{_sep}config{_sep}.cache", __file__)
 EVALUATION_PERCENT = 10
+SPLIT = "random"
+SPLIT_SEED = 0
 DATA_PREFIX = "!"
 DATA_EXTENSION = "json"
 ABSOLUTE_PATH = False
 FORCE_OVERRIDE = False
+JOBS = 1
+LISTING_CACHE = False
+WALK_THREADS = 1
+SORT_FILES = False
+INCREMENTAL = False
+ANNOTATION_CACHE = False
+CHECK_SIZE = False
+DEDUP = "off"
+# shapes without area, outside of the image or duplicated ("off", "report" or "drop")
+GEOMETRY = "report"
+DUPLICATE_IOU = 0.9
 
 # yolo
 YOLO_BACKUP_PATH = _base_off_cwd(f"..{_sep}..{_sep}backup", __file__)
@@ -41,6 +57,15 @@ YOLO_HEIGHT = YOLO_WIDTH = 416
 
 # attributes
 ATTR_MULTIPLE = True
+ATTR_STREAM = False
+ATTR_JSONL = False
+
+# * validate.py
+# directory for fix-up scripts (.bat)
+FIXUP_PATH = "."
+# compare yolo label files with annotations
+CHECK_LABELS = False
+LABEL_TOLERANCE = 1e-4
 
 # * organize.py
 DATA_ROOT = INPUT_PATH
@@ -56,21 +81,40 @@ def _print_defaults() -> None:
     print(
         f"LOG_LEVEL: {LOG_LEVEL}",
         f"CHECK_UNUSED_PARAMS: {CHECK_UNUSED_PARAMS}",
+        f"JSON_BACKEND: {JSON_BACKEND}",
         f"SAVE_ARGS: {SAVE_ARGS}",
         f"EXEC_PATH: {EXEC_PATH}",
         f"OUTPUT_PATH: {OUTPUT_PATH}",
         f"INPUT_PATH: {INPUT_PATH}",
+        f"CACHE_PATH: {CACHE_PATH}",
         f"EVALUATION_PERCENT: {EVALUATION_PERCENT}",
+        f"SPLIT: {SPLIT}",
+        f"SPLIT_SEED: {SPLIT_SEED}",
         f"DATA_PREFIX: {DATA_PREFIX}",
         f"DATA_EXTENSION: {DATA_EXTENSION}",
         f"ABSOLUTE_PATH: {ABSOLUTE_PATH}",
         f"FORCE_OVERRIDE: {FORCE_OVERRIDE}",
+        f"JOBS: {JOBS}",
+        f"LISTING_CACHE: {LISTING_CACHE}",
+        f"WALK_THREADS: {WALK_THREADS}",
+        f"SORT_FILES: {SORT_FILES}",
+        f"INCREMENTAL: {INCREMENTAL}",
+        f"ANNOTATION_CACHE: {ANNOTATION_CACHE}",
+        f"CHECK_SIZE: {CHECK_SIZE}",
+        f"DEDUP: {DEDUP}",
+        f"GEOMETRY: {GEOMETRY}",
+        f"DUPLICATE_IOU: {DUPLICATE_IOU}",
         f"YOLO_BACKUP_PATH: {YOLO_BACKUP_PATH}",
         f"YOLO_BATCH_SIZE: {YOLO_BATCH_SIZE}",
         f"YOLO_SUBDIVISIONS: {YOLO_SUBDIVISIONS}",
         f"YOLO_HEIGHT: {YOLO_HEIGHT}",
         f"YOLO_WIDTH: {YOLO_WIDTH}",
         f"ATTR_MULTIPLE: {ATTR_MULTIPLE}",
+        f"ATTR_STREAM: {ATTR_STREAM}",
+        f"ATTR_JSONL: {ATTR_JSONL}",
+        f"FIXUP_PATH: {FIXUP_PATH}",
+        f"CHECK_LABELS: {CHECK_LABELS}",
+        f"LABEL_TOLERANCE: {LABEL_TOLERANCE}",
         f"DATA_ROOT: {DATA_ROOT}",
         f"USE_PREFIX: {USE_PREFIX}",
         f"NO_PREFIX: {NO_SET_PREFIX}",
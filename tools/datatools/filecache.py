@@ -0,0 +1,98 @@
+import hashlib
+import os
+import time
+
+from typing import Any, Dict, Optional, Tuple
+
+from .jsonio import dumps, load, loads
+from .util import write_atomic
+
+# read files in blocks when hashing
+HASH_BLOCK_SIZE = 1 << 20
+
+# coarsest mtime resolution expected (FAT has 2 s, some NFS servers 1 s)
+MTIME_GRANULARITY_NS = 2 * 10**9
+
+# (size, mtime in ns or None if the file could change without changing it, sha1 of the content)
+Fingerprint = Tuple[int, Optional[int], str]
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_stats(path: str) -> Optional[Tuple[int, int]]:
+    """
+    Returns (size, mtime in ns), or None if the file can't be stat'ed.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def is_racy(mtime: int, time_ns: int) -> bool:
+    """
+    Whether a change in the same mtime tick as time_ns (e.g. the time of a scan) could leave mtime unchanged.
+    """
+    return mtime + MTIME_GRANULARITY_NS >= time_ns
+
+
+def read_fingerprinted(path: str) -> Tuple[bytes, Fingerprint]:
+    """
+    Reads a whole file, the fingerprint describes exactly the returned content.
+    """
+    with open(path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        # changes after this time change the mtime, unless they are in the same tick
+        read_time = time.time_ns()
+        content = file.read()
+    mtime = None if is_racy(stat.st_mtime_ns, read_time) else stat.st_mtime_ns
+    return (content, (stat.st_size, mtime, hashlib.sha1(content).hexdigest()))
+
+
+class JsonCache:
+    """
+    Versioned json file with one entry per key.
+    The file is discarded if its version or header (settings the entries depend on) differ.
+    Entries that were not kept during a run are dropped on save.
+    """
+    # bump in subclasses when the layout of their entries changes
+    version = 1
+
+    def __init__(self, path: Optional[str], header: Optional[Dict[str, Any]] = None) -> None:
+        self.path = path
+        # compared through json, so tuples and lists are the same
+        self.header: Dict[str, Any] = loads(dumps(header or {}))
+        self.entries: Dict[str, Any] = self._load()
+        self.seen: Dict[str, Any] = {}
+
+    def _load(self) -> Dict[str, Any]:
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path) as file:
+                cache = load(file)
+            if cache.get("version") == self.version and \
+                    all(cache.get(key) == value for key, value in self.header.items()):
+                return cache["entries"]
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def keep(self, key: str, entry: Any) -> None:
+        self.seen[key] = entry
+
+    def _saved_entries(self) -> Dict[str, Any]:
+        return self.seen
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        write_atomic(self.path, dumps({"version": self.version, **self.header, "entries": self._saved_entries()}))
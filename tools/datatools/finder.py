@@ -1,38 +1,262 @@
 import os
+import time
 
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from queue import Queue
-from typing import Generator, List
+from typing import Any, Deque, Dict, Generator, Iterable, List, Optional, Tuple
+
+from .filecache import JsonCache, is_racy
+
+# (file names, directory names)
+Listing = Tuple[List[str], List[str]]
+# {file name: (size in bytes, mtime in ns)}
+Stats = Dict[str, Tuple[int, int]]
+
+
+class ListingCache(JsonCache):
+    """
+    [mtime, file names, directory names] of every directory, all entries are kept on save \
+        (a search doesn't have to visit every cached directory).
+    """
+    version = 2
+
+    def _saved_entries(self) -> Dict[str, Any]:
+        return self.entries
 
 
 class Finder:
-    def __init__(self, search_root: str, data_prefix: str, data_extension: str) -> None:
+    def __init__(self, search_root: str, data_prefix: str, data_extension: str,
+                 cache_path: Optional[str] = None, threads: int = 1, sort: bool = False) -> None:
         self.search_root = search_root
         self.data_prefix = data_prefix
         self.data_extension = data_extension
+        # directory listings are cached on disk when set (see _list_dir)
+        self.cache_path = cache_path
+        self._cache: Optional[ListingCache] = None
+        self._cache_changed = False
+        # how many directories are scanned at once (for high latency filesystems)
+        self.threads = threads
+        # sorted file names and a deterministic directory order
+        self.sort = sort
 
-    def _is_data_dir(self, item: os.DirEntry, data_prefix) -> bool:
-        return item.is_dir() and item.name.startswith(data_prefix)
+    def sub_finder(self, search_root: str, data_prefix: str, data_extension: str) -> "Finder":
+        """
+        Returns a Finder with the same settings (cache, threads, sorting) for a different search.
+        """
+        return Finder(search_root, data_prefix, data_extension,
+                      self.cache_path, self.threads, self.sort)
 
-    def _is_data_file(self, item: os.DirEntry, extension) -> bool:
-        return item.is_file() and \
-            (item.name.endswith(f".{extension}") or extension == "")
+    def _is_data_dir(self, name: str, data_prefix) -> bool:
+        return name.startswith(data_prefix)
 
-    def find_all(self, data_extension=None, data_prefix=None, search_root=None) -> Generator[str, None, None]:
-        if data_extension is None:
-            data_extension = self.data_extension
+    def _is_data_file(self, name: str, extension) -> bool:
+        return name.endswith(f".{extension}") or extension == ""
+
+    def _scan_dir(self, _dir: str, stats: Optional[Stats] = None, stat_extensions: Iterable[str] = ()) -> Listing:
+        """
+        Lists a directory with one scandir, (size, mtime) of files with stat_extensions are added to stats \
+            (DirEntry.stat is free on Windows, elsewhere only these files are stat'ed).
+        """
+        files: List[str] = []
+        dirs: List[str] = []
+        for item in os.scandir(_dir):
+            if item.is_file():
+                files.append(item.name)
+                if stats is not None and any(self._is_data_file(item.name, extension)
+                                             for extension in stat_extensions):
+                    stat = item.stat()
+                    stats[item.name] = (stat.st_size, stat.st_mtime_ns)
+            elif item.is_dir():
+                dirs.append(item.name)
+        return (files, dirs)
+
+    def _list_dir(self, _dir: str) -> Listing:
+        """
+        Lists a directory, using the listing cache if enabled.
+        A cached listing is used as long as the mtime of the directory didn't change \
+            (adding, removing or renaming an entry changes it).
+        """
+        if self.cache_path is None:
+            return self._scan_dir(_dir)
+        if self._cache is None:
+            self._cache = ListingCache(self.cache_path)
+        key = os.path.abspath(_dir)
+        mtime = os.stat(_dir).st_mtime_ns
+        cached = self._cache.entries.get(key)
+        if cached is not None and cached[0] == mtime:
+            return (cached[1], cached[2])
+        scan_time = time.time_ns()
+        files, dirs = self._scan_dir(_dir)
+        self._store_listing(key, mtime, scan_time, files, dirs)
+        return (files, dirs)
+
+    def _store_listing(self, key: str, mtime: int, scan_time: int, files: List[str], dirs: List[str]) -> None:
+        """
+        Caches a listing unless the directory changed too shortly before the scan: \
+            a file added in the same mtime tick wouldn't change the mtime ("racily clean" like in git), \
+            such directories are scanned again next time.
+        """
+        assert self._cache is not None
+        entries = self._cache.entries
+        if is_racy(mtime, scan_time):
+            if entries.pop(key, None) is not None:
+                self._cache_changed = True
+            return
+        cached = entries.get(key)
+        if cached is None or cached[0] != mtime or cached[1] != files or cached[2] != dirs:
+            entries[key] = [mtime, files, dirs]
+            self._cache_changed = True
+
+    def _list_dir_stats(self, _dir: str, stat_extensions: Iterable[str]) -> Tuple[Listing, Stats]:
+        """
+        Always scans the directory (file stats change without changing the mtime of the directory), \
+            the listing cache is refreshed with the result.
+        """
+        stats: Stats = {}
+        if self.cache_path is None:
+            return (self._scan_dir(_dir, stats, stat_extensions), stats)
+        if self._cache is None:
+            self._cache = ListingCache(self.cache_path)
+        # mtime before the scan, so changes during the scan are noticed next time
+        mtime = os.stat(_dir).st_mtime_ns
+        scan_time = time.time_ns()
+        files, dirs = self._scan_dir(_dir, stats, stat_extensions)
+        self._store_listing(os.path.abspath(_dir), mtime, scan_time, files, dirs)
+        return ((files, dirs), stats)
+
+    def _listing(self, _dir: str, stat_extensions: Optional[Tuple[str, ...]] = None) \
+            -> Tuple[str, Listing, Optional[Stats]]:
+        stats: Optional[Stats] = None
+        if stat_extensions is not None:
+            (files, dirs), stats = self._list_dir_stats(_dir, stat_extensions)
+        else:
+            files, dirs = self._list_dir(_dir)
+        if self.sort:
+            files, dirs = sorted(files), sorted(dirs)
+        return (_dir, (files, dirs), stats)
+
+    def save_cache(self) -> None:
+        """
+        Writes the listing cache to disk (called automatically after a whole search).
+        """
+        if self._cache is None or not self._cache_changed:
+            return
+        self._cache.save()
+        self._cache_changed = False
+
+    def _walk_dirs(self, data_prefix: str, search_root: str, stat_extensions: Optional[Tuple[str, ...]] = None) \
+            -> Generator[Tuple[str, Listing, Optional[Stats]], None, None]:
+        """
+        Breadth first search through data directories, yields (directory, listing, stats).
+        Stats are None if stat_extensions is None.
+        """
+        if self.cache_path is not None and self._cache is None:
+            # load before threads start using it
+            self._cache = ListingCache(self.cache_path)
+        if self.threads > 1:
+            yield from self._walk_dirs_threaded(data_prefix, search_root, stat_extensions)
+            return
+        unsearched_dirs: Queue[str] = Queue()
+        unsearched_dirs.put(search_root)
+        while not unsearched_dirs.empty():
+            _dir, listing, stats = self._listing(unsearched_dirs.get(), stat_extensions)  # dir shadows a builtin
+            for name in listing[1]:
+                if self._is_data_dir(name, data_prefix):
+                    unsearched_dirs.put(os.path.join(_dir, name))
+            yield (_dir, listing, stats)
+
+    def _walk_dirs_threaded(self, data_prefix: str, search_root: str,
+                            stat_extensions: Optional[Tuple[str, ...]] = None) \
+            -> Generator[Tuple[str, Listing, Optional[Stats]], None, None]:
+        """
+        Scans up to self.threads directories at once.
+        If sorting is enabled, directories are yielded in the same order as in the serial search, \
+            otherwise as soon as they are scanned.
+        """
+        with ThreadPoolExecutor(self.threads) as executor:
+            # submitted scans in search order, or finished scans in the order they finished
+            ordered: Deque[Future] = deque()
+            finished: Queue[Future] = Queue()
+            pending = 0
+
+            def submit(_dir: str) -> None:
+                nonlocal pending
+                future = executor.submit(self._listing, _dir, stat_extensions)
+                if self.sort:
+                    ordered.append(future)
+                else:
+                    future.add_done_callback(finished.put)
+                pending += 1
+
+            submit(search_root)
+            while pending:
+                future = ordered.popleft() if self.sort else finished.get()
+                pending -= 1
+                _dir, listing, stats = future.result()
+                for name in listing[1]:
+                    if self._is_data_dir(name, data_prefix):
+                        submit(os.path.join(_dir, name))
+                yield (_dir, listing, stats)
+
+    def walk(self, extensions: Iterable[str], data_prefix=None, search_root=None) \
+            -> Generator[Tuple[str, Dict[str, List[str]]], None, None]:
+        """
+        Searches the data directories once for all extensions.
+        Yields (directory, {extension: [paths]}) for every searched directory.
+        """
         if data_prefix is None:
             data_prefix = self.data_prefix
         if search_root is None:
             search_root = self.search_root
-        unsearched_dirs: Queue[str] = Queue()
-        unsearched_dirs.put(search_root)
-        while not unsearched_dirs.empty():
-            _dir = unsearched_dirs.get()  # dir shadows a builtin
-            for item in os.scandir(_dir):
-                if self._is_data_file(item, data_extension):
-                    yield item.path
-                elif self._is_data_dir(item, data_prefix):
-                    unsearched_dirs.put(item.path)
+        extensions = list(dict.fromkeys(extensions))  # unique, keep order
+        for _dir, (files, _), _ in self._walk_dirs(data_prefix, search_root):
+            grouped: Dict[str, List[str]] = {extension: [] for extension in extensions}
+            for name in files:
+                for extension in extensions:
+                    if self._is_data_file(name, extension):
+                        grouped[extension].append(os.path.join(_dir, name))
+            yield (_dir, grouped)
+        self.save_cache()
+
+    def walk_stats(self, extensions: Iterable[str], data_prefix=None, search_root=None) \
+            -> Generator[Tuple[str, Dict[str, Dict[str, Tuple[int, int]]]], None, None]:
+        """
+        Like walk, but with sizes and mtimes of the files from the same directory scan (no extra stat or open calls).
+        Yields (directory, {extension: {path: (size, mtime)}}) for every searched directory.
+        """
+        if data_prefix is None:
+            data_prefix = self.data_prefix
+        if search_root is None:
+            search_root = self.search_root
+        extensions = tuple(dict.fromkeys(extensions))
+        for _dir, (files, _), stats in self._walk_dirs(data_prefix, search_root, extensions):
+            assert stats is not None
+            grouped: Dict[str, Dict[str, Tuple[int, int]]] = {extension: {} for extension in extensions}
+            for name in files:
+                for extension in extensions:
+                    if self._is_data_file(name, extension):
+                        grouped[extension][os.path.join(_dir, name)] = stats[name]
+            yield (_dir, grouped)
+        self.save_cache()
+
+    def find_all(self, data_extension=None, data_prefix=None, search_root=None) -> Generator[str, None, None]:
+        if data_extension is None:
+            data_extension = self.data_extension
+        for _, files in self.walk([data_extension], data_prefix, search_root):
+            yield from files[data_extension]
 
     def find_all_list(self, data_extension=None, data_prefix=None, search_root=None) -> List[str]:
         return list(self.find_all(data_extension, data_prefix, search_root))
+
+    def find_all_dict(self, extensions: Iterable[str], data_prefix=None, search_root=None) -> Dict[str, List[str]]:
+        """
+        Like find_all_list, but for multiple extensions in one search.
+        Returns {extension: [paths]}.
+        """
+        extensions = list(extensions)
+        found: Dict[str, List[str]] = {extension: [] for extension in extensions}
+        for _, files in self.walk(extensions, data_prefix, search_root):
+            for extension, paths in files.items():
+                found[extension].extend(paths)
+        return found
@@ -0,0 +1,134 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from .records import Annotation, has_corners
+from .spatial import Rect
+
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
+
+# kinds of GeometryIssue
+DEGENERATE = "degenerate"
+OUTSIDE = "outside"
+DUPLICATE = "duplicate"
+
+# with fewer boxes, python loops are faster than numpy calls
+BATCH_LIMIT = 16
+
+
+class GeometryIssue(NamedTuple):
+    # index of the box (of the shape in lint_annotation)
+    index: int
+    kind: str
+    # the earlier box a DUPLICATE overlaps
+    other: Optional[int] = None
+
+    @property
+    def message(self) -> str:
+        if self.kind == DEGENERATE:
+            return "has no area"
+        if self.kind == OUTSIDE:
+            return "is outside of the image"
+        return f"duplicates shape {self.other}"
+
+
+def _is_rectangle(points: Any, shape_type: Any) -> bool:
+    # malformed points are not checked, converters reject them (see BboxBatch.append)
+    return shape_type in (None, "rectangle") and has_corners(points) and len(points) == 2
+
+
+def _lint_loops(rects: List[List[float]], labels: Sequence[str], width: float, height: float,
+                iou_threshold: float) -> List[GeometryIssue]:
+    issues: List[GeometryIssue] = []
+    areas = [(x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects]
+    for index, (x0, y0, x1, y1) in enumerate(rects):
+        if not areas[index] > 0:
+            issues.append(GeometryIssue(index, DEGENERATE))
+            continue
+        if x0 < 0 or y0 < 0 or x1 > width or y1 > height:
+            issues.append(GeometryIssue(index, OUTSIDE))
+            continue
+        for other in range(index):
+            if labels[other] != labels[index] or not areas[other] > 0:
+                continue
+            ox0, oy0, ox1, oy1 = rects[other]
+            inter = max(min(x1, ox1) - max(x0, ox0), 0.0) * max(min(y1, oy1) - max(y0, oy0), 0.0)
+            if inter / (areas[index] + areas[other] - inter) >= iou_threshold:
+                issues.append(GeometryIssue(index, DUPLICATE, other))
+                break
+    return issues
+
+
+def _lint_numpy(rects: List[List[float]], labels: Sequence[str], width: float, height: float,
+                iou_threshold: float) -> List[GeometryIssue]:
+    boxes = _np.array(rects, dtype=_np.float64)
+    x0, y0, x1, y1 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x1 - x0) * (y1 - y0)
+    degenerate = ~(areas > 0)
+    outside = ~degenerate & ((x0 < 0) | (y0 < 0) | (x1 > width) | (y1 > height))
+    # * IoU of all pairs at once, same operations as the loops
+    inter = _np.maximum(_np.minimum(x1[:, None], x1[None, :]) - _np.maximum(x0[:, None], x0[None, :]), 0.0) * \
+        _np.maximum(_np.minimum(y1[:, None], y1[None, :]) - _np.maximum(y0[:, None], y0[None, :]), 0.0)
+    with _np.errstate(divide="ignore", invalid="ignore"):
+        iou = inter / (areas[:, None] + areas[None, :] - inter)
+    ids: Dict[str, int] = {}
+    label_ids = _np.array([ids.setdefault(label, len(ids)) for label in labels])
+    # [shape, earlier shape]
+    duplicates = _np.tril(iou >= iou_threshold, -1) & (label_ids[:, None] == label_ids[None, :]) & \
+        ~degenerate[None, :] & ~(degenerate | outside)[:, None]
+    issues: List[GeometryIssue] = []
+    for index in range(len(rects)):
+        if degenerate[index]:
+            issues.append(GeometryIssue(index, DEGENERATE))
+        elif outside[index]:
+            issues.append(GeometryIssue(index, OUTSIDE))
+        elif duplicates[index].any():
+            # argmax is the first (earliest) match
+            issues.append(GeometryIssue(index, DUPLICATE, int(duplicates[index].argmax())))
+    return issues
+
+
+def lint_boxes(rects: Sequence[Rect], labels: Sequence[str], width: float, height: float,
+               iou_threshold: float) -> List[GeometryIssue]:
+    """
+    Finds boxes without area, boxes outside of the image and boxes that overlap an earlier box \
+        of the same label with IoU >= iou_threshold (one issue per box, indices are of rects).
+    rects are [Xmin, Ymin, Xmax, Ymax], IoU of all pairs is computed at once with numpy if installed.
+    """
+    rects = [list(rect) for rect in rects]
+    if not rects:
+        return []
+    if _np is None or len(rects) <= BATCH_LIMIT:
+        return _lint_loops(rects, labels, width, height, iou_threshold)
+    return _lint_numpy(rects, labels, width, height, iou_threshold)
+
+
+def lint_annotation(annotation: Annotation, iou_threshold: float) -> List[GeometryIssue]:
+    """
+    Checks all rectangles of an annotation (see lint_boxes), other shapes (and malformed points) are not checked.
+    """
+    indices: List[int] = []
+    rects: List[List[float]] = []
+    labels: List[str] = []
+    for index, shape in enumerate(annotation.shapes):
+        if not _is_rectangle(shape.points, shape.shape_type):
+            continue
+        bbox = shape.bbox()
+        indices.append(index)
+        rects.append([bbox.x_min, bbox.y_min, bbox.x_max, bbox.y_max])
+        labels.append(shape.label)
+    issues = lint_boxes(rects, labels, annotation.image_width, annotation.image_height, iou_threshold)
+    # back to shape indices
+    return [GeometryIssue(indices[issue.index], issue.kind, None if issue.other is None else indices[issue.other])
+            for issue in issues]
+
+
+def drop_shapes(annotation: Annotation, issues: Sequence[GeometryIssue]) -> Annotation:
+    """
+    Returns a copy of annotation without the shapes of issues.
+    """
+    dropped = {issue.index for issue in issues}
+    return Annotation([shape for index, shape in enumerate(annotation.shapes) if index not in dropped],
+                      annotation.image_path, annotation.image_height, annotation.image_width,
+                      annotation.version, annotation.flags, annotation.image_data)
@@ -0,0 +1,88 @@
+import struct
+
+from typing import BinaryIO, Optional, Tuple
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SIGNATURE = b"\xff\xd8"
+
+# start of frame markers (all except DHT, JPG and DAC, which share the range)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# markers without a length
+_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+_APP1 = 0xE1
+_EXIF_ORIENTATION = 0x0112
+
+
+def _exif_orientation(data: bytes) -> int:
+    # data is the APP1 segment without the length, returns 1 (no rotation) if unknown
+    if not data.startswith(b"Exif\0\0"):
+        return 1
+    tiff = data[6:]
+    if tiff[:2] == b"II":
+        order = "<"
+    elif tiff[:2] == b"MM":
+        order = ">"
+    else:
+        return 1
+    try:
+        ifd = struct.unpack_from(order + "I", tiff, 4)[0]
+        count = struct.unpack_from(order + "H", tiff, ifd)[0]
+        for entry in range(ifd + 2, ifd + 2 + count * 12, 12):
+            tag, _, _, value = struct.unpack_from(order + "HHIH", tiff, entry)
+            if tag == _EXIF_ORIENTATION:
+                return value
+    except struct.error:
+        pass
+    return 1
+
+
+def _jpeg_size(file: BinaryIO) -> Optional[Tuple[int, int]]:
+    orientation = 1
+    while True:
+        byte = file.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = file.read(1)
+        # fill bytes
+        while marker == b"\xff":
+            marker = file.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code in _STANDALONE_MARKERS or code == 0x00:
+            continue
+        if code == 0xD9:  # end of image
+            return None
+        header = file.read(2)
+        if len(header) < 2:
+            return None
+        length = struct.unpack(">H", header)[0] - 2
+        if code in _SOF_MARKERS:
+            frame = file.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">xHH", frame)
+            # images with orientation 5-8 are shown rotated (and labelme saves the rotated size)
+            return (height, width) if orientation >= 5 else (width, height)
+        if code == _APP1 and orientation == 1:
+            orientation = _exif_orientation(file.read(length))
+        else:
+            file.seek(length, 1)
+
+
+def image_size(path: str) -> Optional[Tuple[int, int]]:
+    """
+    Returns (width, height) of a JPEG or PNG image from its header (without decoding the image), \
+        or None if the format is not known.
+    Raises OSError if the image can't be read.
+    """
+    with open(path, "rb") as file:
+        start = file.read(24)
+        if start.startswith(PNG_SIGNATURE) and start[12:16] == b"IHDR":
+            return struct.unpack(">II", start[16:24])
+        if start.startswith(JPEG_SIGNATURE):
+            file.seek(2)
+            return _jpeg_size(file)
+    return None
@@ -0,0 +1,72 @@
+import json
+import math
+import re
+
+from importlib import import_module
+from typing import IO, Any, Callable, Union
+
+from . import defaults
+
+# parsers in order of preference (for JSON_BACKEND = "auto")
+BACKENDS = ("orjson", "ujson", "simdjson", "json")
+
+# floats orjson writes differently: exponents ("1e-7" instead of "1e-07") \
+#   and numbers below 1e-4 without one ("0.00001" instead of "1e-05")
+_DIFFERENT_FLOAT = re.compile(rb"[0-9][eE]|0\.0000")
+
+
+def _import_backend(name: str) -> Any:
+    if name != "auto":
+        return import_module(name)
+    for backend in BACKENDS:
+        try:
+            return import_module(backend)
+        except ImportError:
+            continue
+    return json
+
+
+_backend = _import_backend(defaults.JSON_BACKEND)
+backend_name: str = _backend.__name__
+
+_loads: Callable[[Union[str, bytes]], Any] = _backend.loads
+# only orjson writes the same json as the json module (checked in dumps)
+_fast_dumps = _backend.dumps if backend_name == "orjson" else None
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Parses json with the selected backend, raises ValueError for invalid json.
+    """
+    return _loads(data)
+
+
+def load(file: IO) -> Any:
+    return loads(file.read())
+
+
+def _has_non_finite(item: Any) -> bool:
+    if isinstance(item, float):
+        return not math.isfinite(item)
+    if isinstance(item, dict):
+        return any(_has_non_finite(value) for value in item.values())
+    if isinstance(item, (list, tuple)):
+        return any(_has_non_finite(value) for value in item)
+    return False
+
+
+def dumps(item: Any) -> str:
+    """
+    Compact json, the same as json.dumps(item, separators=(",", ":")) with every backend.
+    orjson output is only used if it can't differ (checked on the output, with a false alarm json is used).
+    """
+    if _fast_dumps is not None:
+        try:
+            raw = _fast_dumps(item)
+        except TypeError:
+            raw = None
+        # json escapes non-ASCII characters and writes NaN and Infinity (orjson null)
+        if raw is not None and raw.isascii() and _DIFFERENT_FLOAT.search(raw) is None \
+                and not (b"null" in raw and _has_non_finite(item)):
+            return raw.decode()
+    return json.dumps(item, separators=(",", ":"))
@@ -0,0 +1,138 @@
+import mmap
+import re
+
+from typing import Any, Dict, Optional, Tuple
+
+from .filecache import Fingerprint, read_fingerprinted
+from .jsonio import loads
+
+# keys of a labelme file that are parsed, the rest is skipped without decoding
+READ_KEYS = ("version", "flags", "shapes", "imagePath", "imageHeight", "imageWidth")
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+_SCALAR_END = re.compile(rb"[^,}\] \t\n\r]*")
+_STRUCTURAL = re.compile(rb'["\[\]{}]')
+
+
+class ImageData:
+    """
+    Lazy reference to the imageData string of a labelme file (read only when needed).
+    """
+
+    def __init__(self, path: str, start: int, end: int) -> None:
+        self.path = path
+        self.start = start
+        self.end = end
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def read(self) -> Optional[str]:
+        with open(self.path, "rb") as file:
+            file.seek(self.start)
+            return loads(file.read(self.end - self.start))
+
+
+def _skip_whitespace(buffer, pos: int) -> int:
+    return _WHITESPACE.match(buffer, pos).end()
+
+
+def _string_end(buffer, pos: int) -> int:
+    # pos is the index of the opening quote, returns index after the closing quote
+    while True:
+        pos = buffer.find(b'"', pos + 1)
+        if pos < 0:
+            raise ValueError("Unterminated string")
+        backslashes = 0
+        while buffer[pos - 1 - backslashes] == 0x5C:  # \
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return pos + 1
+
+
+def _value_end(buffer, pos: int) -> int:
+    # pos is the index of the first character of a value, returns index after it
+    first = buffer[pos:pos + 1]
+    if first == b'"':
+        return _string_end(buffer, pos)
+    if first not in (b"[", b"{"):
+        end = _SCALAR_END.match(buffer, pos).end()
+        if end == pos:
+            raise ValueError(f"Expecting value (char {pos})")
+        return end
+    depth = 0
+    while True:
+        match = _STRUCTURAL.search(buffer, pos)
+        if match is None:
+            raise ValueError("Unterminated array or object")
+        pos = match.start()
+        char = buffer[pos:pos + 1]
+        if char == b'"':
+            pos = _string_end(buffer, pos)
+            continue
+        depth += 1 if char in (b"[", b"{") else -1
+        pos += 1
+        if depth == 0:
+            return pos
+
+
+def _parse(buffer, path: str) -> Dict[str, Any]:
+    pos = _skip_whitespace(buffer, 0)
+    if buffer[pos:pos + 1] != b"{":
+        raise ValueError("Expecting object")
+    file: Dict[str, Any] = {}
+    pos = _skip_whitespace(buffer, pos + 1)
+    while buffer[pos:pos + 1] != b"}":
+        if buffer[pos:pos + 1] != b'"':
+            raise ValueError(f"Expecting property name enclosed in double quotes (char {pos})")
+        key_end = _string_end(buffer, pos)
+        key = loads(buffer[pos:key_end])
+        pos = _skip_whitespace(buffer, key_end)
+        if buffer[pos:pos + 1] != b":":
+            raise ValueError(f"Expecting ':' delimiter (char {pos})")
+        start = _skip_whitespace(buffer, pos + 1)
+        end = _value_end(buffer, start)
+        if key in READ_KEYS:
+            file[key] = loads(buffer[start:end])
+        elif key == "imageData":
+            file[key] = None if buffer[start:end] == b"null" else ImageData(path, start, end)
+        pos = _skip_whitespace(buffer, end)
+        char = buffer[pos:pos + 1]
+        if char == b"}":
+            break
+        if char != b",":
+            raise ValueError(f"Expecting ',' delimiter (char {pos})")
+        pos = _skip_whitespace(buffer, pos + 1)
+        if buffer[pos:pos + 1] != b'"':
+            raise ValueError(f"Expecting property name enclosed in double quotes (char {pos})")
+    if _skip_whitespace(buffer, pos + 1) != len(buffer):
+        raise ValueError(f"Extra data (char {pos + 1})")
+    return file
+
+
+def read_labelme(path: str) -> Dict[str, Any]:
+    """
+    Reads a labelme annotation file, but only decodes the keys in READ_KEYS.
+    imageData (base64 image) is only located and returned as an ImageData reference, \
+        so reading doesn't depend on the size of the embedded image.
+    Raises ValueError for files that are not valid json objects.
+    """
+    with open(path, "rb") as file:
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files can't be mapped
+            raise ValueError("Empty annotation file") from None
+    with buffer:
+        return _parse(buffer, path)
+
+
+def read_labelme_fingerprinted(path: str) -> Tuple[Dict[str, Any], Fingerprint]:
+    """
+    Like read_labelme, but the whole file is read and fingerprinted (see read_fingerprinted), \
+        so the fingerprint is of exactly the parsed content.
+    """
+    buffer, fingerprint = read_fingerprinted(path)
+    if not buffer:
+        raise ValueError("Empty annotation file")
+    return (_parse(buffer, path), fingerprint)
@@ -0,0 +1,60 @@
+import os
+import time
+
+from typing import Any, Dict, List, Tuple
+
+from .filecache import Fingerprint, JsonCache, file_stats, hash_file, is_racy
+
+
+class Manifest(JsonCache):
+    """
+    Remembers converted input files (size, mtime, content hash), their results and output files.
+    An input is only converted again if its content, one of its outputs \
+        or the converter parameters changed.
+    A None mtime (the file could have changed without changing it) always compares the hash.
+    """
+    version = 2
+
+    def __init__(self, path: str, params: Dict[str, Any]) -> None:
+        super().__init__(path, {"params": params})
+
+    def _outputs_valid(self, entry: Dict[str, Any]) -> bool:
+        for output, stats in entry["outputs"].items():
+            if file_stats(output) != (None if stats is None else tuple(stats)):
+                return False
+        return True
+
+    def lookup(self, path: str) -> Tuple[bool, Any]:
+        """
+        Returns (True, result) if the result of the last conversion is still valid, else (False, None).
+        """
+        key = os.path.abspath(path)
+        entry = self.entries.get(key)
+        if entry is None:
+            return (False, None)
+        stats = file_stats(path)
+        if stats is None:
+            return (False, None)
+        if stats != (entry["size"], entry["mtime"]):
+            # touched, but maybe not changed
+            hash_time = time.time_ns()
+            if hash_file(path) != entry["hash"]:
+                return (False, None)
+            entry["size"], entry["mtime"] = (stats[0], None if is_racy(stats[1], hash_time) else stats[1])
+        if not self._outputs_valid(entry):
+            return (False, None)
+        self.keep(key, entry)
+        return (True, entry["result"])
+
+    def record(self, path: str, result: Any, outputs: List[str], fingerprint: Fingerprint) -> None:
+        """
+        Stores a result, fingerprint is of the content it was converted from (see read_fingerprinted).
+        """
+        size, mtime, digest = fingerprint
+        self.keep(os.path.abspath(path), {
+            "size": size,
+            "mtime": mtime,
+            "hash": digest,
+            "result": result,
+            "outputs": {output: file_stats(output) for output in outputs},
+        })
@@ -0,0 +1,111 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from .util import is_number
+
+# value of keys that are not in the file (Ellipsis stays the same object through pickle)
+MISSING: Any = ...
+
+
+def has_corners(points: Any) -> bool:
+    """
+    Whether points (from json, not checked) start with two [X, Y] number pairs.
+    """
+    return isinstance(points, list) and len(points) >= 2 and \
+        all(isinstance(point, list) and len(point) == 2 and is_number(point[0]) and is_number(point[1])
+            for point in points[:2])
+
+
+class Bbox:
+    """
+    Axis aligned box, corners are ordered (min <= max).
+    """
+    __slots__ = ("x_min", "y_min", "x_max", "y_max")
+
+    def __init__(self, x_min: float, y_min: float, x_max: float, y_max: float) -> None:
+        self.x_min = x_min
+        self.y_min = y_min
+        self.x_max = x_max
+        self.y_max = y_max
+
+    @classmethod
+    def from_corners(cls, first: List[float], second: List[float]) -> "Bbox":
+        """
+        Box of two opposite corners in any order.
+        """
+        x0, y0, x1, y1 = first[0], first[1], second[0], second[1]
+        return cls(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+
+    @property
+    def width(self) -> float:
+        return self.x_max - self.x_min
+
+    @property
+    def height(self) -> float:
+        return self.y_max - self.y_min
+
+
+class Shape:
+    """
+    One labelme shape.
+    """
+    __slots__ = ("label", "points", "shape_type", "flags")
+
+    def __init__(self, label: str, points: List[List[float]],
+                 shape_type: Optional[str] = None, flags: Optional[Dict[str, bool]] = None) -> None:
+        self.label = label
+        self.points = points
+        self.shape_type = shape_type
+        self.flags: Dict[str, bool] = {} if flags is None else flags
+
+    @classmethod
+    def from_dict(cls, shape: Dict[str, Any]) -> "Shape":
+        return cls(shape["label"], shape["points"], shape.get("shape_type"), shape.get("flags", {}))
+
+    def selected_flag(self, selection: Iterable[str]) -> str:
+        """
+        Returns the first set flag that is in selection.
+        Raises ValueError if there is none.
+        """
+        for flag, value in self.flags.items():
+            if value and flag in selection:
+                return flag
+        raise ValueError("No known flag specified")
+
+    def bbox(self) -> Bbox:
+        """
+        Returns the box of the first two points (corners of a rectangle).
+        Raises ValueError if they aren't [X, Y] numbers.
+        """
+        if not has_corners(self.points):
+            raise ValueError("Bbox needs two points of two numbers")
+        return Bbox.from_corners(self.points[0], self.points[1])
+
+
+class Annotation:
+    """
+    Parsed labelme file, keys that are not needed for conversion are MISSING if not in the file.
+    """
+    __slots__ = ("shapes", "image_path", "image_height", "image_width", "version", "flags", "image_data")
+
+    def __init__(self, shapes: List[Shape], image_path: str, image_height: int, image_width: int,
+                 version: Any = MISSING, flags: Any = MISSING, image_data: Any = MISSING) -> None:
+        self.shapes = shapes
+        self.image_path = image_path
+        self.image_height = image_height
+        self.image_width = image_width
+        self.version = version
+        self.flags = flags
+        # None, ImageData reference (see read_labelme) or MISSING
+        self.image_data = image_data
+
+    @classmethod
+    def from_dict(cls, file: Dict[str, Any]) -> "Annotation":
+        """
+        Raises KeyError if a key needed for conversion is missing.
+        """
+        return cls([Shape.from_dict(shape) for shape in file["shapes"]],
+                   file["imagePath"], file["imageHeight"], file["imageWidth"],
+                   file.get("version", MISSING), file.get("flags", MISSING), file.get("imageData", MISSING))
+
+    def has_all_keys(self) -> bool:
+        return self.version is not MISSING and self.flags is not MISSING and self.image_data is not MISSING
@@ -0,0 +1,67 @@
+from math import ceil, floor, sqrt
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Rect = Sequence[float]
+"""[Xmin, Ymin, Xmax, Ymax]"""
+Point = Sequence[float]
+"""[X, Y]"""
+
+# with fewer rectangles, checking all of them is faster than building the grid
+LINEAR_SCAN_LIMIT = 16
+
+
+def is_point_in_rect(point: Point, rect: Rect) -> bool:
+    # point: [x, y]
+    # rect: [xmin, ymin, xmax, ymax]
+    return point[0] > rect[0] and \
+        point[0] < rect[2] and \
+        point[1] > rect[1] and \
+        point[1] < rect[3]
+
+
+class RectIndex:
+    """
+    Uniform grid over rectangles, finds the first rectangle (in the given order) \
+        that contains a point (borders excluded) without checking all of them.
+    """
+
+    def __init__(self, rects: Sequence[Rect]) -> None:
+        self.rects = rects
+        # rectangle indices (ascending) of every cell, None for a linear scan
+        self.cells: Optional[Dict[Tuple[int, int], List[int]]] = None
+        if len(rects) > LINEAR_SCAN_LIMIT:
+            self._build()
+
+    def _build(self) -> None:
+        self.min_x = min(rect[0] for rect in self.rects)
+        self.min_y = min(rect[1] for rect in self.rects)
+        # about one rectangle per cell
+        self.columns = self.rows = ceil(sqrt(len(self.rects)))
+        self.cell_width = (max(rect[2] for rect in self.rects) - self.min_x) / self.columns or 1.0
+        self.cell_height = (max(rect[3] for rect in self.rects) - self.min_y) / self.rows or 1.0
+        self.cells = {}
+        for index, rect in enumerate(self.rects):
+            column_start, row_start = self._cell(rect[0], rect[1])
+            column_end, row_end = self._cell(rect[2], rect[3])
+            for column in range(column_start, column_end + 1):
+                for row in range(row_start, row_end + 1):
+                    self.cells.setdefault((column, row), []).append(index)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        # clamped, so points outside the grid still map to a cell (they are not in any rectangle)
+        column = min(max(floor((x - self.min_x) / self.cell_width), 0), self.columns - 1)
+        row = min(max(floor((y - self.min_y) / self.cell_height), 0), self.rows - 1)
+        return (column, row)
+
+    def first_containing(self, point: Point) -> Optional[int]:
+        """
+        Returns the index of the first rectangle containing point, or None.
+        """
+        if self.cells is None:
+            candidates: Sequence[int] = range(len(self.rects))
+        else:
+            candidates = self.cells.get(self._cell(point[0], point[1]), [])
+        for index in candidates:
+            if is_point_in_rect(point, self.rects[index]):
+                return index
+        return None
@@ -0,0 +1,26 @@
+import hashlib
+import os
+
+
+class HashSplit:
+    """
+    Assigns files to the evaluation set by a seeded hash of their stable id \
+        (path relative to the data root, without extension).
+    Every file is decided on its own, so the split needs no shuffle, \
+        doesn't change when files are added and an image and its annotation always end up together.
+    """
+
+    def __init__(self, root: str, eval_percent: float, seed: int = 0) -> None:
+        self.root = os.path.abspath(root)
+        self.eval_percent = eval_percent
+        self.seed = seed
+
+    def stable_id(self, path: str) -> str:
+        path = os.path.abspath(path)
+        if path.startswith(self.root + os.path.sep):
+            path = path[len(self.root) + 1:]
+        return path.rsplit(".", 1)[0].replace(os.path.sep, "/")
+
+    def is_eval(self, path: str) -> bool:
+        digest = hashlib.blake2b(f"{self.seed}:{self.stable_id(path)}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") * 100 < self.eval_percent * (1 << 64)
@@ -1,6 +1,8 @@
 import os as _os
 
 from pathlib import Path as _Path
+from typing import Any as _Any
+from typing import Dict as _Dict
 from typing import Union as _Union
 
 
@@ -11,6 +13,13 @@ def round_to_digits(num: float, digits: int) -> _Union[int, float]:
     return round(num, digits) if digits > 0 else round(num)
 
 
+def is_number(value: _Any) -> bool:
+    """
+    Whether a parsed json value is a number (bools are not).
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
 def get_relpath(_from: str, to: str) -> str:
     """
     Get a relative path from somewhere to somewhere (inputs can be relative or absolute paths).
@@ -20,6 +29,29 @@ def get_relpath(_from: str, to: str) -> str:
     return _os.path.relpath(to, __from)
 
 
+class PathResolver:
+    """
+    Makes paths relative to a base (like get_relpath) or absolute.
+    The base is resolved once and results are cached per directory, \
+        so resolving a path doesn't touch the filesystem.
+    """
+
+    def __init__(self, base: str, absolute: bool = False) -> None:
+        _base = _Path(base)
+        self.base = _os.path.abspath(_base.parent if _base.is_file() else _base)
+        self.absolute = absolute
+        self._prefixes: _Dict[str, str] = {}
+
+    def resolve(self, path: str) -> str:
+        directory, name = _os.path.split(path)
+        prefix = self._prefixes.get(directory)
+        if prefix is None:
+            directory_path = _os.path.abspath(directory or ".")
+            prefix = directory_path if self.absolute else _os.path.relpath(directory_path, self.base)
+            self._prefixes[directory] = prefix
+        return name if prefix == "." else _os.path.join(prefix, name)
+
+
 def base_off_cwd(path: str, _from: str) -> str:
     """
     Returns path relative from current working directory.
@@ -28,3 +60,45 @@ def base_off_cwd(path: str, _from: str) -> str:
     If _from is a folder, the string MUST end with a slash!
     """
     return get_relpath(".", _os.path.join(_os.path.dirname(_from), path))
+
+
+def _write_atomic(path: str, content: _Union[str, bytes], mode: str) -> None:
+    temp_path = f"{path}.{_os.getpid()}.tmp"
+    try:
+        with open(temp_path, mode) as file:
+            file.write(content)
+        _os.replace(temp_path, path)
+    except BaseException:
+        if _os.path.exists(temp_path):
+            _os.remove(temp_path)
+        raise
+
+
+def write_atomic(path: str, content: str) -> None:
+    """
+    Writes a file through a temporary file in the same directory, \
+        so the file is never left half written.
+    """
+    _write_atomic(path, content, "w")
+
+
+def write_atomic_bytes(path: str, content: bytes) -> None:
+    """
+    Binary version of write_atomic.
+    """
+    _write_atomic(path, content, "wb")
+
+
+def write_if_changed(path: str, content: str) -> bool:
+    """
+    Writes a text file (atomically) only if its content differs, so unchanged files keep their mtime.
+    Returns whether the file was written.
+    """
+    try:
+        with open(path, newline="") as file:
+            if file.read() == content.replace("\n", _os.linesep):
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    write_atomic(path, content)
+    return True
@@ -0,0 +1,517 @@
+import os
+import time
+
+from abc import ABCMeta, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from . import defaults
+from .bbox import BboxBatch, collect_labels
+from .filecache import Fingerprint, JsonCache, hash_file, is_racy
+from .finder import Finder
+from .geometry import drop_shapes, lint_annotation
+from .labelme import read_labelme, read_labelme_fingerprinted
+from .records import Annotation
+from .util import is_number, write_atomic
+
+# fix-up scripts a finding can be added to (see write_fixups)
+REANNOTATE = "reannotate"
+ADD_BLANK = "add_blank"
+DELETE = "delete"
+
+FIXUP_FILES = {
+    REANNOTATE: "open_broken_in_labelme.bat",
+    ADD_BLANK: "add_empty_txt_to_broken.bat",
+    DELETE: "delete_empty_annotations.bat",
+}
+
+# images checked per worker task
+VALIDATION_CHUNK_SIZE = 64
+
+# (size, mtime) from the directory scan
+FileStats = Tuple[int, int]
+
+
+class Finding(NamedTuple):
+    # image path without extension
+    path: str
+    rule: str
+    message: str
+    fixes: Tuple[str, ...] = ()
+
+
+def _size(stats: Optional[FileStats]) -> Optional[int]:
+    return None if stats is None else stats[0]
+
+
+def _check_types(annotation: Annotation) -> None:
+    """
+    Raises TypeError if a value the rules use has a wrong json type (checked like the annotation cache does).
+    Points can have any count and length (see GeometryRule), but only numbers.
+    """
+    if not isinstance(annotation.image_height, int) or not isinstance(annotation.image_width, int) \
+            or not isinstance(annotation.shapes, list):
+        raise TypeError("annotation")
+    for shape in annotation.shapes:
+        if not isinstance(shape.label, str) or not (shape.shape_type is None or isinstance(shape.shape_type, str)) \
+                or not isinstance(shape.flags, dict) or not isinstance(shape.points, list) \
+                or not all(isinstance(point, list) and all(is_number(value) for value in point)
+                           for point in shape.points):
+            raise TypeError("shape")
+
+
+class ImageFiles:
+    """
+    Files of one image with stats from the directory listing (None if the file is missing), \
+        the annotation is parsed when a rule needs it.
+    """
+    __slots__ = ("path", "annotation_extension", "image_stats", "annotation_stats", "labels_stats",
+                 "_annotation", "_error", "_fingerprint")
+
+    def __init__(self, path: str, annotation_extension: str, image_stats: FileStats,
+                 annotation_stats: Optional[FileStats], labels_stats: Optional[FileStats]) -> None:
+        self.path = path
+        self.annotation_extension = annotation_extension
+        self.image_stats = image_stats
+        self.annotation_stats = annotation_stats
+        self.labels_stats = labels_stats
+        self._annotation: Optional[Annotation] = None
+        self._error: Optional[str] = None
+        self._fingerprint: Optional[Fingerprint] = None
+
+    @property
+    def image_size(self) -> int:
+        return self.image_stats[0]
+
+    @property
+    def annotation_size(self) -> Optional[int]:
+        return _size(self.annotation_stats)
+
+    @property
+    def labels_size(self) -> Optional[int]:
+        return _size(self.labels_stats)
+
+    @property
+    def has_annotation(self) -> bool:
+        return self.annotation_stats is not None
+
+    @property
+    def has_labels(self) -> bool:
+        return self.labels_stats is not None
+
+    @property
+    def annotation_path(self) -> str:
+        return f"{self.path}.{self.annotation_extension}"
+
+    @property
+    def labels_path(self) -> str:
+        return f"{self.path}.txt"
+
+    def _parse(self, fingerprinted: bool) -> None:
+        try:
+            if fingerprinted:
+                file, self._fingerprint = read_labelme_fingerprinted(self.annotation_path)
+            else:
+                file = read_labelme(self.annotation_path)
+            annotation = Annotation.from_dict(file)
+            _check_types(annotation)
+            self._annotation = annotation
+        except (OSError, ValueError) as e:
+            self._error = str(e)
+        except (KeyError, TypeError):
+            self._error = "Not in labelme format"
+
+    def annotation(self) -> Optional[Annotation]:
+        """
+        Returns the parsed annotation, or None if it is missing or not valid (see error).
+        """
+        if self._annotation is None and self._error is None and self.has_annotation:
+            self._parse(False)
+        return self._annotation
+
+    def fingerprint(self) -> Optional[Fingerprint]:
+        """
+        Parses the annotation (before any rule does) and returns the fingerprint of exactly the parsed content, \
+            None if it is missing or can't be read.
+        """
+        if self._annotation is None and self._error is None and self.has_annotation:
+            self._parse(True)
+        return self._fingerprint
+
+    def error(self) -> Optional[str]:
+        self.annotation()
+        return self._error
+
+
+class Rule(metaclass=ABCMeta):
+    name = ""
+    # bump when findings of the rule change (cached findings are dropped, see ValidationCache)
+    version = 1
+
+    @abstractmethod
+    def check(self, files: ImageFiles) -> Iterable[Finding]:
+        pass
+
+    def params(self) -> Dict[str, Any]:
+        """
+        Settings that affect findings (json serializable).
+        """
+        return {}
+
+    def finding(self, files: ImageFiles, message: str, *fixes: str) -> Finding:
+        return Finding(files.path, self.name, message, fixes)
+
+
+class MissingAnnotationRule(Rule):
+    name = "missing_annotation"
+
+    def check(self, files: ImageFiles) -> Iterable[Finding]:
+        if files.has_annotation:
+            return
+        if not files.has_labels:
+            yield self.finding(files, "No data file present. Annotate the picture or create an empty .txt file",
+                               REANNOTATE, ADD_BLANK)
+        elif files.labels_size:
+            yield self.finding(files, "Annotation file missing but .txt file not empty", REANNOTATE, ADD_BLANK)
+
+
+class EmptyImageRule(Rule):
+    name = "empty_image"
+
+    def check(self, files: ImageFiles) -> Iterable[Finding]:
+        if files.image_size == 0:
+            yield self.finding(files, "Image file empty")
+
+
+class EmptyAnnotationRule(Rule):
+    name = "empty_annotation"
+
+    def check(self, files: ImageFiles) -> Iterable[Finding]:
+        if not files.has_annotation:
+            return
+        if files.annotation_size == 0:
+            yield self.finding(files, "Annotation file empty, please reannotate or delete it", REANNOTATE, DELETE)
+        elif files.error() is not None:
+            yield self.finding(files, f"Annotation file not valid ({files.error()})", REANNOTATE)
+
+
+class UnknownLabelRule(Rule):
+    name = "unknown_label"
+
+    def __init__(self, vehicle_types: Sequence[str], colors: Sequence[str]) -> None:
+        self.flags = set(vehicle_types) | set(colors)
+
+    def params(self) -> Dict[str, Any]:
+        return {"flags": sorted(self.flags)}
+
+    def check(self, files: ImageFiles) -> Iterable[Finding]:
+        annotation = files.annotation()
+        if annotation is None:
+            return
+        for shape in annotation.shapes:
+            if shape.label in ("vehicle", "color"):
+                continue
+            if shape.label in self.flags:
+                yield self.finding(files, f"Flag '{shape.label}' used as a label", REANNOTATE)
+            else:
+                yield self.finding(files, f"Unknown label '{shape.label}'", REANNOTATE)
+
+
+class MissingFlagRule(Rule):
+    name = "missing_flag"
+
+    def __init__(self, vehicle_types: Sequence[str], colors: Sequence[str]) -> None:
+        self.selections = {"vehicle": set(vehicle_types)}
+        # colors are only checked if they are known
+        if colors:
+            self.selections["color"] = set(colors)
+
+    def params(self) -> Dict[str, Any]:
+        return {label: sorted(selection) for label, selection in self.selections.items()}
+
+    def check(self, files: ImageFiles) -> Iterable[Finding]:
+        annotation = files.annotation()
+        if annotation is None:
+            return
+        for shape in annotation.shapes:
+            selection = self.selections.get(shape.label)
+            if selection is None:
+                continue
+            if not any(value and flag in selection for flag, value in shape.flags.items()):
+                yield self.finding(files, f"No known flag of a {shape.label}", REANNOTATE)
+
+
+class GeometryRule(Rule):
+    name = "geometry"
+
+    def __init__(self, iou_threshold: float) -> None:
+        self.iou_threshold = iou_threshold
+
+    def params(self) -> Dict[str, Any]:
+        return {"iou_threshold": self.iou_threshold}
+
+    def check(self, files: ImageFiles) -> Iterable[Finding]:
+        annotation = files.annotation()
+        if annotation is None:
+            return
+        for index, shape in enumerate(annotation.shapes):
+            if len(shape.points) != 2 or any(len(point) != 2 for point in shape.points):
+                yield self.finding(files, f"Shape {index} ({shape.label}) is not a rectangle", REANNOTATE)
+        for issue in lint_annotation(annotation, self.iou_threshold):
+            shape = annotation.shapes[issue.index]
+            yield self.finding(files, f"Shape {issue.index} ({shape.label}) {issue.message}", REANNOTATE)
+
+
+class LabelsRule(Rule):
+    """
+    Compares existing yolo label files with lines the yolo export would write for the annotation \
+        (with the same --geometry and --duplicate_iou).
+    """
+    name = "labels"
+
+    def __init__(self, vehicle_types: Sequence[str], tolerance: float,
+                 geometry: str = defaults.GEOMETRY, iou_threshold: float = defaults.DUPLICATE_IOU) -> None:
+        # same class ids as the yolo export
+        self.classes = {name: index for index, name in enumerate(vehicle_types)}
+        self.tolerance = tolerance
+        self.geometry = geometry
+        self.iou_threshold = iou_threshold
+
+    def params(self) -> Dict[str, Any]:
+        return {"classes": self.classes, "tolerance": self.tolerance,
+                "geometry": self.geometry, "iou_threshold": self.iou_threshold}
+
+    def _read_labels(self, path: str) -> List[Tuple[int, List[float]]]:
+        # raises ValueError if a line is not "class x y width height"
+        with open(path) as file:
+            lines = [line.split() for line in file.read().splitlines() if line.strip()]
+        labels: List[Tuple[int, List[float]]] = []
+        for line in lines:
+            if len(line) != 5:
+                raise ValueError(f"line '{' '.join(line)}'")
+            labels.append((int(line[0]), [float(value) for value in line[1:]]))
+        return labels
+
+    def check(self, files: ImageFiles) -> Iterable[Finding]:
+        annotation = files.annotation()
+        if annotation is None or not files.has_labels:
+            return
+        if self.geometry == "drop":
+            # the export left these shapes out
+            annotation = drop_shapes(annotation, lint_annotation(annotation, self.iou_threshold))
+        batch = BboxBatch()
+        try:
+            class_ids = collect_labels(annotation, self.classes, batch)
+        except ValueError:
+            # not exported (reported by other rules)
+            return
+        try:
+            labels = self._read_labels(files.labels_path)
+        except (OSError, ValueError) as e:
+            yield self.finding(files, f"Labels file not valid ({e})")
+            return
+        if len(labels) != len(class_ids):
+            yield self.finding(files, f"Labels file has {len(labels)} labels, annotation has {len(class_ids)} vehicles")
+            return
+        for line, ((class_id, row), expected_id, expected) in enumerate(zip(labels, class_ids, batch.normalize())):
+            if class_id != expected_id or any(abs(value - expected_value) > self.tolerance
+                                              for value, expected_value in zip(row, expected)):
+                yield self.finding(files, f"Label {line} differs from the annotation, export again")
+                return
+
+
+def default_rules(vehicle_types: Sequence[str], colors: Sequence[str],
+                  iou_threshold: float = defaults.DUPLICATE_IOU) -> List[Rule]:
+    return [
+        EmptyImageRule(),
+        MissingAnnotationRule(),
+        EmptyAnnotationRule(),
+        UnknownLabelRule(vehicle_types, colors),
+        MissingFlagRule(vehicle_types, colors),
+        GeometryRule(iou_threshold),
+    ]
+
+
+class ValidationCache(JsonCache):
+    """
+    Findings of every image from the last run, reused as long as the rules, the content of the annotation \
+        and the size and mtime of the image and the labels file don't change.
+    """
+    version = 2
+
+    def __init__(self, path: str, rules: List[Rule]) -> None:
+        super().__init__(path, {"rules": [[rule.name, rule.version, rule.params()] for rule in rules]})
+
+    def lookup(self, files: ImageFiles) -> Optional[List[Finding]]:
+        """
+        Returns findings of the last run, or None if the image has to be checked again.
+        """
+        key = os.path.abspath(files.path)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        # a changed neighbour (image or labels) changes findings as well
+        if entry["image"] != list(files.image_stats) or \
+                entry["labels"] != (None if files.labels_stats is None else list(files.labels_stats)):
+            return None
+        annotation = entry["annotation"]
+        if annotation is None or files.annotation_stats is None:
+            if annotation is not None or files.annotation_stats is not None:
+                return None
+        elif annotation[:2] != list(files.annotation_stats):
+            # touched, but maybe not changed
+            hash_time = time.time_ns()
+            try:
+                digest = hash_file(files.annotation_path)
+            except OSError:
+                return None
+            if digest != annotation[2]:
+                return None
+            size, mtime = files.annotation_stats
+            entry["annotation"] = [size, None if is_racy(mtime, hash_time) else mtime, digest]
+        self.keep(key, entry)
+        return [Finding(files.path, rule, message, tuple(fixes)) for rule, message, fixes in entry["findings"]]
+
+    def record(self, files: ImageFiles, findings: List[Finding], fingerprint: Optional[Fingerprint]) -> None:
+        """
+        Stores findings, fingerprint is of the annotation content they were found in (see ImageFiles.fingerprint).
+        """
+        annotation = None
+        if fingerprint is not None:
+            annotation = list(fingerprint)
+        elif files.annotation_stats is not None:
+            # not readable, checked again once it changes
+            annotation = [*files.annotation_stats, None]
+        self.keep(os.path.abspath(files.path), {
+            "image": list(files.image_stats),
+            "labels": None if files.labels_stats is None else list(files.labels_stats),
+            "annotation": annotation,
+            "findings": [[finding.rule, finding.message, list(finding.fixes)] for finding in findings],
+        })
+
+
+# rules of the current worker process (set by _init_worker)
+_worker_rules: List[Rule] = []
+# whether workers hash annotations for the cache
+_worker_hash = False
+
+
+def _init_worker(rules: List[Rule], hash_annotations: bool) -> None:
+    global _worker_rules, _worker_hash
+    _worker_rules = rules
+    _worker_hash = hash_annotations
+
+
+def check_files(rules: List[Rule], files: ImageFiles) -> List[Finding]:
+    findings: List[Finding] = []
+    for rule in rules:
+        findings.extend(rule.check(files))
+    return findings
+
+
+def _check_and_hash(rules: List[Rule], files: ImageFiles, hash_annotation: bool) \
+        -> Tuple[List[Finding], Optional[Fingerprint]]:
+    # read before the rules, so they check the content that is hashed
+    fingerprint = files.fingerprint() if hash_annotation else None
+    return (check_files(rules, files), fingerprint)
+
+
+def _check_chunk(chunk: List[ImageFiles]) -> List[Tuple[List[Finding], Optional[Fingerprint]]]:
+    return [_check_and_hash(_worker_rules, files, _worker_hash) for files in chunk]
+
+
+def _stems(files: Dict[str, FileStats]) -> Dict[str, FileStats]:
+    return {path.rsplit(".", 1)[0]: stats for path, stats in files.items()}
+
+
+def find_files(finder: Finder, image_extension: str, annotation_extension: str) \
+        -> Tuple[List[ImageFiles], List[Finding]]:
+    """
+    Scans every directory once and matches images, annotations and labels by name.
+    Returns (files of every image, findings of annotations and labels without an image).
+    """
+    images: List[ImageFiles] = []
+    orphans: List[Finding] = []
+    for _, files in finder.walk_stats([image_extension, annotation_extension, "txt"]):
+        stems = _stems(files[image_extension])
+        annotations = _stems(files[annotation_extension])
+        labels = _stems(files["txt"])
+        for path, stats in stems.items():
+            images.append(ImageFiles(path, annotation_extension, stats, annotations.get(path), labels.get(path)))
+        for path in (annotations.keys() | labels.keys()) - stems.keys():
+            extensions = [f".{extension}" for extension, found in
+                          ((annotation_extension, annotations), ("txt", labels)) if path in found]
+            orphans.append(Finding(path, "orphan", f"No image for {', '.join(extensions)} file"))
+    return (images, orphans)
+
+
+def validate(images: List[ImageFiles], rules: List[Rule], jobs: int = 1,
+             findings: Optional[List[Finding]] = None, cache: Optional[ValidationCache] = None) -> List[Finding]:
+    """
+    Runs all rules on all images, either serially or in a process pool.
+    With a cache, only new and changed images are checked (the cache is saved afterwards).
+    Returns findings (added to the given ones, e.g. from find_files) sorted by path.
+    """
+    findings = [] if findings is None else list(findings)
+    unchecked = images
+    if cache is not None:
+        unchecked = []
+        for files in images:
+            cached = cache.lookup(files)
+            if cached is None:
+                unchecked.append(files)
+            else:
+                findings.extend(cached)
+    hash_annotations = cache is not None
+    results: List[Tuple[List[Finding], Optional[Fingerprint]]] = []
+    # starting workers isn't worth it for a few changed files
+    if jobs <= 1 or len(unchecked) <= VALIDATION_CHUNK_SIZE:
+        results = [_check_and_hash(rules, files, hash_annotations) for files in unchecked]
+    else:
+        chunks = [unchecked[i:i + VALIDATION_CHUNK_SIZE] for i in range(0, len(unchecked), VALIDATION_CHUNK_SIZE)]
+        with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(rules, hash_annotations)) as executor:
+            for chunk_results in executor.map(_check_chunk, chunks):
+                results.extend(chunk_results)
+    for files, (image_findings, fingerprint) in zip(unchecked, results):
+        findings.extend(image_findings)
+        if cache is not None:
+            cache.record(files, image_findings, fingerprint)
+    if cache is not None:
+        cache.save()
+    findings.sort(key=lambda finding: finding.path)
+    return findings
+
+
+def format_report(findings: List[Finding]) -> str:
+    lines: List[str] = []
+    last_path = None
+    for finding in findings:
+        if finding.path != last_path:
+            lines.append(finding.path)
+            last_path = finding.path
+        lines.append(f"    [{finding.rule}] {finding.message}")
+    return "\n".join(lines)
+
+
+def write_fixups(findings: List[Finding], directory: str, image_extension: str = defaults.IMAGE_EXTENSION,
+                 annotation_extension: str = defaults.DATA_EXTENSION) -> Dict[str, int]:
+    """
+    Writes every fix-up script once (also when empty, so old entries don't stay).
+    Returns {script: number of images in it}.
+    """
+    scripts: Dict[str, List[str]] = {fix: [] for fix in FIXUP_FILES}
+    added: Dict[str, Set[str]] = {fix: set() for fix in FIXUP_FILES}
+    for finding in findings:
+        for fix in finding.fixes:
+            if finding.path in added[fix]:
+                continue
+            added[fix].add(finding.path)
+            if fix == REANNOTATE:
+                scripts[fix].append(f"call ./start_labelme.bat {finding.path}.{image_extension}\n")
+            elif fix == ADD_BLANK:
+                scripts[fix].append(f"echo '' > {finding.path}.txt\n")
+            elif fix == DELETE:
+                scripts[fix].append(f"del {finding.path}.txt\ndel {finding.path}.{annotation_extension}\n")
+    for fix, lines in scripts.items():
+        write_atomic(os.path.join(directory, FIXUP_FILES[fix]), "".join(lines))
+    return {FIXUP_FILES[fix]: len(paths) for fix, paths in added.items()}
@@ -0,0 +1,103 @@
+import os
+import shutil
+
+from tempfile import TemporaryFile
+from typing import Any, Dict, List
+
+from .jsonio import dumps
+
+
+class JsonArrayWriter:
+    """
+    Writes a json array one item at a time.
+    The output is the same as dumps(items) (compact json).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.count = 0
+        self.file = open(path, "w")
+        self.file.write("[")
+
+    def write(self, item: Any) -> None:
+        if self.count > 0:
+            self.file.write(",")
+        self.file.write(dumps(item))
+        self.count += 1
+
+    def close(self) -> None:
+        self.file.write("]")
+        self.file.close()
+
+    def __enter__(self) -> "JsonArrayWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+class JsonLinesWriter(JsonArrayWriter):
+    """
+    Writes one json item per line (JSON Lines).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.count = 0
+        self.file = open(path, "w")
+
+    def write(self, item: Any) -> None:
+        self.file.write(dumps(item))
+        self.file.write("\n")
+        self.count += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def open_json_writer(path: str, lines: bool = False) -> JsonArrayWriter:
+    return JsonLinesWriter(path) if lines else JsonArrayWriter(path)
+
+
+class CocoWriter:
+    """
+    Writes a COCO detection file one image at a time, assigning image and annotation IDs.
+    Annotations are spooled to a temporary file and appended after the images, \
+        so neither is kept in memory.
+    """
+
+    def __init__(self, path: str, categories: List[Dict[str, Any]]) -> None:
+        self.path = path
+        self.image_count = 0
+        self.annotation_count = 0
+        self.file = open(path, "w")
+        self.file.write('{"categories":' + dumps(categories) + ',"images":[')
+        self.annotations = TemporaryFile("w+", dir=os.path.dirname(os.path.abspath(path)))
+
+    def write(self, image: Dict[str, Any], annotations: List[Dict[str, Any]]) -> None:
+        """
+        Writes an image with its annotations (without ids, they are assigned here).
+        """
+        self.image_count += 1
+        if self.image_count > 1:
+            self.file.write(",")
+        self.file.write(dumps({"id": self.image_count, **image}))
+        for annotation in annotations:
+            self.annotation_count += 1
+            if self.annotation_count > 1:
+                self.annotations.write(",")
+            self.annotations.write(dumps({"id": self.annotation_count, "image_id": self.image_count, **annotation}))
+
+    def close(self) -> None:
+        self.file.write('],"annotations":[')
+        self.annotations.seek(0)
+        shutil.copyfileobj(self.annotations, self.file)
+        self.annotations.close()
+        self.file.write("]}")
+        self.file.close()
+
+    def __enter__(self) -> "CocoWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
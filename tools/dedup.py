@@ -0,0 +1,44 @@
+import argparse
+import os
+import time
+
+from datatools import defaults
+from datatools.dedup import find_duplicates
+from datatools.finder import Finder
+from datatools.logger import get_logger
+
+logger = get_logger()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Find images with the same content in the data set"
+    )
+    parser.add_argument("-i", "--input", default=defaults.INPUT_PATH, metavar="PATH",
+                        help="Directory with input files")
+    parser.add_argument("-p", "--prefix", default=defaults.DATA_PREFIX,
+                        help="Prefix to folders with data")
+    parser.add_argument("--image_extension", default=defaults.IMAGE_EXTENSION, metavar="EXTENSION",
+                        help="Image files extension")
+    parser.add_argument("-j", "--jobs", type=int, default=defaults.JOBS, metavar="N",
+                        help="How many processes hash images (1 = no worker processes)")
+    parser.add_argument("--cache", default=defaults.CACHE_PATH, metavar="PATH",
+                        help="Directory for cache files")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logger.debug(args)
+    start = time.perf_counter()
+    images = Finder(args.input, args.prefix, args.image_extension).find_all_list()
+    groups = find_duplicates(images, os.path.join(args.cache, "image_hashes.json"), args.jobs)
+    for group in groups:
+        logger.warning(f"Same images: {', '.join(group)}")
+    logger.success(f"Found {len(groups)} groups of same images ({len(images)} images) "
+                   f"in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
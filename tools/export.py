@@ -3,11 +3,12 @@ import sys
 import time
 
 from pathlib import Path
+from typing import Dict, List, Set, Tuple
 
 from genericpath import exists
 
 from datatools import defaults
-from datatools.converters import name_converter_map
+from datatools.converters import check_formats, convert_many, name_converter_map
 from datatools.logger import get_logger
 from datatools.util import base_off_cwd, get_relpath
 
@@ -18,17 +19,50 @@ LAST_ARGS_SAVE_PATH = base_off_cwd(
 logger = get_logger()
 
 
-def parse_args():
+def _value_options(parser: argparse.ArgumentParser) -> Set[str]:
+    # options that take a value (a format name after them is not a new format)
+    return {option for action in parser._actions if action.nargs != 0 for option in action.option_strings}
+
+
+def split_formats(argv: List[str], parser: argparse.ArgumentParser,
+                  subparsers: Dict[str, argparse.ArgumentParser]) -> List[List[str]]:
+    """
+    Splits arguments at format names: the first part has the global arguments and the first format, \
+        every other part starts with a format name.
+    """
+    parts: List[List[str]] = [[]]
+    value_options = _value_options(parser)
+    has_format = False
+    for index, arg in enumerate(argv):
+        if arg in subparsers and not (index > 0 and argv[index - 1] in value_options):
+            if has_format:
+                parts.append([])
+            has_format = True
+            value_options = _value_options(subparsers[arg])
+        parts[-1].append(arg)
+    return parts
+
+
+def parse_args() -> Tuple[argparse.ArgumentParser, List[argparse.Namespace]]:
+    """
+    Returns the parser and arguments for every format to export (e.g. export.py yolo attributes).
+    Options of a format that are not given again are the same as for the previous format, \
+        so an option given to a format (like --force or --dedicated) can't be unset for the later ones.
+    """
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
         description="Convert car annotation files from labelme to different format",
-        epilog=f"For more info on formats, use {get_relpath('.', __file__)} <format> -h"
+        epilog=f"For more info on formats, use {get_relpath('.', __file__)} <format> -h. " +
+        "Multiple formats can be exported in one pass: <format> [args] <format> [args] ... " +
+        "Later formats get the options of the previous one (a flag can't be turned off again)."
     )
     formats = parser.add_subparsers(dest="format", required=True)
+    subparsers: Dict[str, argparse.ArgumentParser] = {}
     for name, converter in name_converter_map.items():
         subparser = formats.add_parser(
             name, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
         converter.add_parser_arguments(subparser)
+        subparsers[name] = subparser
 
     parser.add_argument("-S", "--save_args", action="store_const",
                         const=not defaults.SAVE_ARGS, default=defaults.SAVE_ARGS,
@@ -36,25 +70,38 @@ def parse_args():
 
     if len(sys.argv) == 1 and exists(LAST_ARGS_SAVE_PATH):
         with open(LAST_ARGS_SAVE_PATH) as file:
-            args = parser.parse_args(file.read().split())
+            argv = file.read().split()
+        save = False
     else:
-        args = parser.parse_args()
-        if args.save_args:
-            with open(LAST_ARGS_SAVE_PATH, "w") as file:
-                file.write(" ".join(sys.argv[1:]))
-    return args
+        argv = sys.argv[1:]
+        save = True
+    parts = split_formats(argv, parser, subparsers)
+    args = [parser.parse_args(parts[0])]
+    for part in parts[1:]:
+        namespace = argparse.Namespace(**vars(args[-1]))
+        namespace.format = part[0]
+        args.append(subparsers[part[0]].parse_args(part[1:], namespace))
+    if save and args[0].save_args:
+        with open(LAST_ARGS_SAVE_PATH, "w") as file:
+            file.write(" ".join(argv))
+    return (parser, args)
 
 
 def main():
-    args = parse_args()
-    logger.debug(args)
-    converter_class = name_converter_map[args.format]
-    converter = converter_class(args)
+    parser, formats = parse_args()
+    converters = []
+    for args in formats:
+        logger.debug(args)
+        converters.append(name_converter_map[args.format](args))
+    try:
+        check_formats(converters)
+    except ValueError as e:
+        parser.error(str(e))
     # raise NotImplementedError(
     #     "Might not be fully done yet, please do not mess up the dataset")
     logger.info("converting...")
     start = time.perf_counter()
-    converter.convert()
+    convert_many(converters)
     logger.debug(f"Took {time.perf_counter() - start:.2f} s")
 
 
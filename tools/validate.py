@@ -1,165 +1,81 @@
+import argparse
 import os
+import time
 
-from json import load
-from pathlib import Path
-from typing import Any, Dict, List
-
-from datatools.defaults import DATA_PREFIX, INPUT_PATH
+from datatools import defaults
 from datatools.finder import Finder
-from genericpath import exists
-
-ENABLE_CMD_PRINTING = True
-
-if ENABLE_CMD_PRINTING:
-    try:
-        # zdroj: https://stackoverflow.com/q/36760127/1047788
-        import ctypes
-
-        kernel32 = ctypes.windll.kernel32
-        kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
-    except AttributeError:
-        pass
-
-
-class Logger:
-    reset_color = "\x1b[0m"
-    red_color = "\x1b[31;1m"
-    green_color = "\x1b[32;1m"
-    yellow_color = "\x1b[33;1m"
-    blue_color = "\x1b[34;1m"
-
-    @classmethod
-    def success(cls, message: str = ""):
-        print(cls.green_color + "SUCCESS" +
-              cls.reset_color + ": " + f"{message}")
-
-    @classmethod
-    def error(cls, message: str = ""):
-        print(cls.red_color + "ERROR" + cls.reset_color + ": " + f"{message}")
-
-    @classmethod
-    def warn(cls, message: str = "") -> None:
-        print(cls.yellow_color + "WARN" +
-              cls.reset_color + ": " + f"{message}")
-
-    @classmethod
-    def info(cls, message: str = ""):
-        print(cls.blue_color + "INFO" + cls.reset_color + ": " + f"{message}")
-
-
-class Validator:
-    def __init__(self) -> None:
-        self.check_colors = True
-        self.validation_search_path = INPUT_PATH
-        self.finder = Finder(self.validation_search_path, DATA_PREFIX, "jpg")
-        self._set_types()
-        self.reannotate = "./open_broken_in_labelme.bat"
-        self.add_blanks = "./add_empty_txt_to_broken.bat"
-        self.delete_annotations = "./delete_empty_annotations.bat"
-        self.batch_files = [self.reannotate,
-                            self.add_blanks, self.delete_annotations]
-        for file in self.batch_files:
-            if exists(file):
-                f = open(self.reannotate, "w")
-                f.close()
-
-    # TODO selection what to do
-    def _warn_add_file(self, path_no_ext: str, message: str):
-        Logger.warn(message)
-        self._add_to_reannotate(path_no_ext)
-        self._add_to_blanks(path_no_ext)
-
-    def _add_to_reannotate(self, path_no_ext: str):
-        with open(self.reannotate, "a") as file:
-            file.write(f"call ./start_labelme.bat {path_no_ext}.jpg\n")
-
-    def _add_to_blanks(self, path_no_ext: str):
-        with open(self.add_blanks, "a") as file:
-            file.write(f"echo '' > {path_no_ext}.txt\n")
-
-    def _add_to_delete(self, path_no_ext: str):
-        with open(self.delete_annotations, "a") as file:
-            file.write(f"del {path_no_ext}.txt\n")
-            file.write(f"del {path_no_ext}.json\n")
-
-    def _set_types(self):
-        # from current file to _labelme
-        with open(
-            os.path.join(
-                Path(os.path.abspath(__file__)
-                     ).parent, "_labelme/labelflags.json"
-            )
-        ) as f:
-            json = load(f)
-            self.vehicle_types = json["vehicle"]
-            self.colors = json["color"]
-
-    # FIXME: make this work
-    def _type_from_flags(self, shape: Dict[str, Dict[str, bool]], selection):
-        for flag, value in shape["flags"].items():
-            if value and flag in selection:
-                return flag
-        raise ValueError("No known flag specified")
-
-    # FIXME: make this work
-    def _parse_shapes(self, shapes: List[Dict[str, Any]]) -> None:
-        veh_num = 0
-        col_num = 0
-        for shape in shapes:
-            if shape["label"] == "vehicle":
-                veh_num += 1
-            elif shape["label"] == "color":
-                col_num += 1
-            elif shape["label"] in self.vehicle_types:
-                self._warn_add_file("<path>", "")
-                veh_num += 1
-            elif shape["label"] in self.colors:
-                self._warn_add_file("<path>", "")
-                col_num += 1
-            else:
-                raise ValueError("unknown label")
-
-    # TODO better checking
-    def _check_files_exist(self, path_no_extension: str) -> None:
-        annotation_exists = exists(f"{path_no_extension}.json")
-        yolo_exists = exists(f"{path_no_extension}.txt")
-        if not annotation_exists:
-            Logger.info(f"\nAnnotation file missing: {path_no_extension}.json")
-            if yolo_exists:
-                with open(f"{path_no_extension}.txt") as yolo:
-                    if yolo.read() != "":
-                        self._warn_add_file(
-                            path_no_extension,
-                            "Annotation file missing but .txt file not empty",
-                        )
-            else:
-                # both yolo and annotation not present
-                self._warn_add_file(
-                    path_no_extension,
-                    "No data file present. Annotate the picture or create an empty .txt file",
-                )
-        else:
-            with open(f"{path_no_extension}.json") as file:
-                if file.read() == "":
-                    self._warn_add_file(
-                        path_no_extension,
-                        "Annotation file empty, please reannotate or delete it",
-                    )
-
-    def validate_file(self, path_no_extension: str) -> None:
-        self._check_files_exist(path_no_extension)
-
-    def validate_all(self):
-        Logger.info("Expecting annotation extension = json\n")
-        for path in self.finder.find_all():
-            self.validate_file(path.rsplit(".", 1)[0])
+from datatools.jsonio import load
+from datatools.logger import get_logger
+from datatools.util import base_off_cwd
+from datatools.validation import LabelsRule, ValidationCache, default_rules, find_files, format_report, validate, write_fixups
+
+logger = get_logger()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Check annotations of the data set and write fix-up scripts for broken files"
+    )
+    parser.add_argument("-i", "--input", default=defaults.INPUT_PATH, metavar="PATH",
+                        help="Directory with input files")
+    parser.add_argument("-p", "--prefix", default=defaults.DATA_PREFIX,
+                        help="Prefix to folders with data")
+    parser.add_argument("--data_extension", default=defaults.DATA_EXTENSION, metavar="EXTENSION",
+                        help="Data files extension")
+    parser.add_argument("--image_extension", default=defaults.IMAGE_EXTENSION, metavar="EXTENSION",
+                        help="Image files extension")
+    parser.add_argument("-j", "--jobs", type=int, default=defaults.JOBS, metavar="N",
+                        help="How many processes check files (1 = no worker processes)")
+    parser.add_argument("--cache", default=defaults.CACHE_PATH, metavar="PATH",
+                        help="Directory for cache files")
+    parser.add_argument("--incremental", action="store_const",
+                        const=not defaults.INCREMENTAL, default=defaults.INCREMENTAL,
+                        help="Whether to check only images whose annotation, image or labels changed \
+                            since the last validation (other findings are reused)")
+    parser.add_argument("--duplicate_iou", type=float, default=defaults.DUPLICATE_IOU, metavar="IOU",
+                        help="Rectangles of the same label overlapping at least this much are duplicates")
+    parser.add_argument("--check_labels", action="store_const",
+                        const=not defaults.CHECK_LABELS, default=defaults.CHECK_LABELS,
+                        help="Whether to compare yolo label files (.txt) with the annotations")
+    parser.add_argument("--geometry", choices=["off", "report", "drop"], default=defaults.GEOMETRY,
+                        help="--geometry of the export that wrote the label files \
+                            (with drop, rectangles without area, outside of the image or duplicated are not expected)")
+    parser.add_argument("--label_tolerance", type=float, default=defaults.LABEL_TOLERANCE, metavar="TOLERANCE",
+                        help="Largest difference of label values (relative to the image size) that is not reported")
+    parser.add_argument("--fixup", default=defaults.FIXUP_PATH, metavar="PATH",
+                        help="Directory to write fix-up scripts to")
+    parser.add_argument("-r", "--report", default=None, metavar="PATH",
+                        help="File to write the report to (besides the console)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logger.debug(args)
+    start = time.perf_counter()
+    with open(base_off_cwd("_labelme/labelflags.json", __file__)) as file:
+        flags = load(file)
+    finder = Finder(args.input, args.prefix, args.image_extension)
+    # * one scan per directory, orphans are found by names only
+    images, orphans = find_files(finder, args.image_extension, args.data_extension)
+    rules = default_rules(flags["vehicle"], flags["color"], args.duplicate_iou)
+    if args.check_labels:
+        rules.append(LabelsRule(flags["vehicle"], args.label_tolerance, args.geometry, args.duplicate_iou))
+    cache = ValidationCache(os.path.join(args.cache, "validation.json"), rules) if args.incremental else None
+    findings = validate(images, rules, args.jobs, orphans, cache)
+    # * one report for all files
+    report = format_report(findings)
+    if report:
+        logger.warning(f"Found problems:\n{report}")
+    if args.report is not None:
+        with open(args.report, "w") as report_file:
+            report_file.write(report)
+    for script, count in write_fixups(findings, args.fixup, args.image_extension, args.data_extension).items():
+        logger.info(f"{script}: {count} images")
+    logger.success(f"Checked {len(images)} images, {len(findings)} problems "
+                   f"in {time.perf_counter() - start:.2f} s")
 
 
 if __name__ == "__main__":
-    raise NotImplementedError(
-        "This script should not be used, because it is old")
-    try:
-        validator = Validator()
-        validator.validate_all()
-    except Exception as e:
-        Logger.error(str(e.with_traceback(None)))
+    main()